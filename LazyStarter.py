@@ -1,49 +1,135 @@
 # -*- coding: utf-8 -*-
 # Command Line interface to interact with poloniex
 # if you don't get it, don't use it
-import ccxt
 import logging
 import logging.handlers
+import argparse
+import atexit
 import json
 import sys
 import os
-import zebitexFormatted
-from time import time, sleep
+import threading
+from rateLimiter import TokenBucket, ApiRequester
+from orderLedger import OrderLedger
+from grid import Grid, rebuy_amount
+from fillDetector import FillDetector
+from scheduler import PollScheduler
+from metrics import MetricsRegistry, MetricsExporter, COUNT_BUCKETS
+from stateStore import StateStore
+from tradeHistory import TradeHistory
+from marketCache import MarketCache
+from order import Order
+from fixedPoint import FixedPoint
+from logReader import tail_order_events
+from logQueue import start_queue_logging
+from structLog import StructLogger
+from time import sleep, perf_counter
 from copy import deepcopy
 from decimal import *
 from pathlib import Path
 from datetime import datetime
-from operator import itemgetter
+from timestamps import now_ms, ms_to_str
+from operator import attrgetter
+from itertools import repeat
+from concurrent.futures import ThreadPoolExecutor
+
+# Answers of the headless mode when its config file doesn't give them.
+# resume: resume from the state store when a previous run is found.
+# cancel_off_strat: cancel the open orders outside of the grid.
+# cancel_wrong_amount: cancel the orders of the grid with another amount.
+# duplicate_order: 1 or 2, the order canceled when two share a price, in
+# the order they are listed by the question.
+HEADLESS_DEFAULTS = {'params_file': 'params.txt',
+                     'resume': True,
+                     'cancel_off_strat': False,
+                     'cancel_wrong_amount': False,
+                     'duplicate_order': 1}
+
 
 class LazyStarter:
-    getcontext().prec = 15
 
     def __init__(self):
+        # Time from the start to the first cycle is measured in main_loop
+        self.started_at = perf_counter()
         # Without assigning it first, it always return true
         self.script_position = os.path.dirname(sys.argv[0])
         self.root_path = f'{self.script_position}/' if self.script_position else ''
         self.keys_file = f'{self.root_path}keys.txt'
+        # Records waiting to be written, debug records are dropped when full
+        self.log_queue_size = 10000
+        self.log_listeners = []
+        atexit.register(self.stop_logging)
+        # Dumps of the whole open orders done every cycle are only logged
+        # one cycle out of dump_sample
+        self.dump_sample = 10
         self.stratlog = self.logger_setup('stratlogs', 'strat.log',
             '%(message)s', logging.DEBUG, logging.INFO)
         self.applog = self.logger_setup('debugs', 'app.log',
             '%(asctime)s - %(levelname)s - %(message)s', logging.DEBUG,
             logging.DEBUG)
         self.user_market_name_list = []
-        self.ccxt_exchanges_list = self.exchanges_list_init()
         self.keys = self.keys_initialisation()
         self.exchange = None
-        self.fees_coef = Decimal('0.9975')
+        self.fees_coef = Order.fees_coef
+        # Precision of the prices and of the amounts of the selected market,
+        # strategy math is done on integers scaled to it
+        self.price_fp = FixedPoint()
+        self.amount_fp = FixedPoint()
+        # Amount and cost limits of the selected market, ccxt like
+        self.market_limits = {}
+        # Markets of the marketplace saved on disk, refreshed once older
+        # than market_cache_ttl seconds
+        self.market_cache = None
+        self.market_cache_ttl = 86400
         self.user_balance = {}
         self.selected_market = None
-        self.open_orders = {'sell': [], 'buy': []}
+        self.open_orders = OrderLedger()
         self.history = {'sell': [], 'buy': []}
         self.params = {}
-        self.intervals = []
-        self.err_counter = 0
+        self.intervals = Grid([])
+        self.api = None
         self.now = 0
         self.safety_buy_value = Decimal('0.00000001')
         self.safety_sell_value = Decimal('1')
         self.max_sell_index = None
+        # Maximum number of orders sent at the same time by a batch. Set it
+        # to 1 for marketplaces which reject concurrent signed requests.
+        self.max_orders_in_flight = 8
+        self.fill_detector = None
+        # Fills read by an error recovery between two cycles, given to the
+        # next cycle
+        self.pending_fills = []
+        self.fill_lock = threading.Lock()
+        # Trades asked per page by the fill detector, Zebitex pages are read
+        # newest first until the fill cursor
+        self.my_trades_limit = 100
+        # Filled amount of the partially filled orders, by order id
+        self.filled_amounts = {}
+        # Every full_sync_every cycles the open orders are fetched even when
+        # no fill have been detected
+        self.full_sync_every = 12
+        # Last price of the market used to size the wait between two cycles,
+        # read from the ticker at full syncs and from the fills otherwise
+        self.last_price = None
+        self.scheduler = PollScheduler(self.applog, min_interval=1,
+            max_interval=20)
+        # Replaced by the clock of the fake marketplace when it is selected
+        self.sleep = sleep
+        # Cycle timings, API latencies and order counters, written to
+        # metrics_file every metrics_interval seconds
+        self.metrics = MetricsRegistry()
+        self.metrics_file = f'{self.root_path}logfiles/metrics.prom'
+        self.metrics_format = 'prometheus'
+        self.metrics_interval = 15
+        self.metrics_exporter = None
+        # Parameters, order events and ledger of the selected marketplace
+        self.state_store = None
+        # User trades of the selected market, fed by the fill detector and
+        # read by the error recovery
+        self.trade_history = None
+        # Config answering the questions in headless mode, None when the user
+        # answer them
+        self.headless = None
 
     """
     ########################## __INIT__ + MANDATORY ###########################
@@ -52,7 +138,10 @@ class LazyStarter:
     def logger_setup(self, name, log_file, log_formatter, console_level,
         file_level, logging_level=logging.DEBUG):
         """Generate logging systems which display any level on the console
-        and starting from INFO into logging file
+        and starting from INFO into logging file.
+        Records go through a bounded queue, the formatting and the I/O are
+        done by a listener thread so logging doesn't slow down the strategy.
+        Setting up a logger again replace its previous handlers.
         name: string, name of the logger,
         log_file: string, name of the file where to place the log datas.
         log_formatter: string, how the log is formated. See Formatter logging
@@ -62,34 +151,32 @@ class LazyStarter:
         file_level: logging object, the logging level to put in the
             logging file. Need to be superior to logging_level.
         logging_level: logging object, optional, the level of logging to catch.
-        return: logging object, contain rules for logging.
+        return: StructLogger object, contain rules for logging.
         """
         dir_name = f'{self.root_path}logfiles'
         self.create_dir_when_none('logfiles')
         log_file = f'{dir_name}/{log_file}'
         logger = logging.getLogger(name)
-        logger.setLevel(logging_level)
+        logger.setLevel(max(logging_level, min(console_level, file_level)))
         formatter = logging.Formatter(log_formatter)
         # Console handler stream
         ch = logging.StreamHandler()
         ch.setLevel(console_level)
         ch.setFormatter(formatter)
-        # File Handler stream
-        fh = logging.FileHandler(log_file)
+        # Only one file handler, it rotate the file
+        fh = logging.handlers.RotatingFileHandler(
+                  log_file, maxBytes=2000000, backupCount=20)
         fh.setLevel(file_level)
         fh.setFormatter(formatter)
-        logger.addHandler(ch)
-        logger.addHandler(fh)
-        handler = logging.handlers.RotatingFileHandler(
-                  log_file, maxBytes=2000000, backupCount=20)
-        logger.addHandler(handler)
-        return logger
+        self.log_listeners.append(start_queue_logging(logger, [ch, fh],
+            self.log_queue_size))
+        return StructLogger(logger)
 
-    def exchanges_list_init(self):
-        """Little hack to add zebitex to ccxt exchange list.
-        return: list, list of exchanges."""
-        ccxt_exchanges_list = ccxt.exchanges
-        return ccxt_exchanges_list + ['zebitex', 'zebitex_testnet']
+    def stop_logging(self):
+        """Write the records waiting in the logging queues and stop the
+        listener threads."""
+        while self.log_listeners:
+            self.log_listeners.pop().stop()
 
     def keys_initialisation(self): # Need to be refactored
         """Check if a key.txt file exist and create one if none.
@@ -135,44 +222,178 @@ class LazyStarter:
                             raise KeyError(msg)
                         else:
                             self.user_market_name_list.append(k)
-                        if k not in self.ccxt_exchanges_list:
-                            raise NameError('The marketplace name is invalid!')
                 except Exception as e:
                     self.applog.critical(f'Something went wrong : {e}')
                     self.exit()
                 keys.update(key)
             return keys
 
+    def headless_init(self, config_file=''):
+        """Switch to the headless mode: LW doesn't ask anything and the
+        answers come from a JSON config file, headless.json by default,
+        completed by HEADLESS_DEFAULTS. Without marketplace in it, the only
+        one of keys.txt is used, without market, the one of the parameters.
+        config_file: string, optional, path of the config file.
+        return: dict, the headless config."""
+        config = dict(HEADLESS_DEFAULTS)
+        file_name = config_file or f'{self.root_path}headless.json'
+        if os.path.isfile(file_name):
+            try:
+                with open(file_name, mode='r', encoding='utf-8') as f:
+                    config.update(json.load(f))
+            except Exception as e:
+                self.applog.critical(f'Something went wrong when loading '
+                    f'{file_name}: {e}')
+                self.exit()
+        elif config_file:
+            self.applog.critical(f'{file_name} doesn\'t exist')
+            self.exit()
+        try:
+            self.headless_checker(config)
+        except ValueError as e:
+            self.applog.critical(f'The headless config is invalid: {e}')
+            self.exit()
+        self.headless = config
+        self.applog.info(f'Headless mode: {config}')
+        return config
+
+    def headless_checker(self, config):
+        """Verify the answers of the headless config before anything is
+        asked to it.
+        config: dict, headless config."""
+        for policy in ('resume', 'cancel_off_strat', 'cancel_wrong_amount'):
+            if not isinstance(config[policy], bool):
+                raise ValueError(f'{policy} must be true or false')
+        if config['duplicate_order'] not in (1, 2):
+            raise ValueError('duplicate_order must be 1 or 2')
+        return True
+
+    def headless_answer(self, q, policy):
+        """Answer of the headless config to a question.
+        q: string, the question.
+        policy: string, key of the answer in the config.
+        return: the answer, LW exit when the config doesn't have it."""
+        if policy is None or self.headless.get(policy) is None:
+            self.applog.critical(f'No answer in headless mode to: {q}')
+            self.exit()
+        self.applog.info(f'{q} >> {self.headless[policy]} ({policy})')
+        return self.headless[policy]
+
+    def headless_marketplace(self):
+        """return: int, position of the marketplace of the headless config
+            in user_market_name_list."""
+        name = self.headless.get('marketplace')
+        if name is None and len(self.user_market_name_list) == 1:
+            name = self.user_market_name_list[0]
+        if name not in self.user_market_name_list:
+            self.applog.critical(f'The headless marketplace {name} isn\'t '
+                f'in keys.txt')
+            self.exit()
+        return self.user_market_name_list.index(name)
+
+    def headless_market(self):
+        """return: string, market of the headless config or of the
+            parameters."""
+        market = self.headless.get('market')
+        if market is None:
+            params = self.headless.get('params') or {}
+            market = params.get('market')
+        file_path = os.path.join(self.root_path, self.headless['params_file'])
+        if market is None and os.path.isfile(file_path):
+            try:
+                market = json.loads(self.read_one_line(file_path, 0))['market']
+            except Exception:
+                market = None
+        market = str(market).upper()
+        if market not in self.exchange.symbols\
+            or self.limitation_to_btc_market(market) is not True:
+            self.applog.critical(f'The headless market {market} isn\'t valid')
+            self.exit()
+        return market
+
     def select_marketplace(self):
         """Marketplace sélection menu, connect to the selected marketplace.
         return: string, the name of the selected marketplace
         """
         q = 'Please select a market:'
-        choice = self.ask_to_select_in_a_list(q, self.user_market_name_list)
+        if self.headless is not None:
+            choice = self.headless_marketplace()
+        else:
+            choice = self.ask_to_select_in_a_list(q,
+                self.user_market_name_list)
+        # The marketplace modules are imported once selected, so importing
+        # LazyStarter doesn't load requests nor ccxt
         if self.user_market_name_list[choice] == 'zebitex':
+            import zebitexFormatted
             self.exchange = zebitexFormatted.ZebitexFormatted(
                 self.keys[self.user_market_name_list[choice]]['apiKey'],
                 self.keys[self.user_market_name_list[choice]]['secret'],
-                False)
+                False, self.metrics, lean=True)
         elif self.user_market_name_list[choice] == 'zebitex_testnet':
+            import zebitexFormatted
             self.exchange = zebitexFormatted.ZebitexFormatted(
                 self.keys[self.user_market_name_list[choice]]['apiKey'],
                 self.keys[self.user_market_name_list[choice]]['secret'],
-                True)
+                True, self.metrics, lean=True)
+        elif self.user_market_name_list[choice] == 'fake':
+            import fakeExchange
+            # Every key in keys.txt is a FakeExchange parameter
+            self.exchange = fakeExchange.FakeExchange(
+                **self.keys[self.user_market_name_list[choice]])
+            self.sleep = self.exchange.sleep
+            # Orders are matched instantly, keep ids in a deterministic order
+            self.max_orders_in_flight = 1
         else:
-            msg = (
-                    f'ccxt.{self.user_market_name_list[choice]}'
-                    f'({str(self.keys[self.user_market_name_list[choice]])})'
-                )
-            self.exchange = eval(msg)
+            self.exchange = self.ccxt_exchange(self.user_market_name_list[choice])
+        self.api = self.api_requester_init()
+        self.market_cache = MarketCache(
+            f'{self.root_path}{self.user_market_name_list[choice]}_markets.json',
+            self.fetch_market_metadata, self.market_cache_ttl, self.applog)
+        return self.user_market_name_list[choice]
+
+    def ccxt_exchange(self, name):
+        """Connect to a marketplace through ccxt. ccxt is only imported here,
+        it's long to import and runs on the other marketplaces don't need it.
+        name: string, ccxt id of the marketplace.
+        return: ccxt exchange object."""
+        import ccxt
+        if name not in ccxt.exchanges:
+            self.applog.critical('Something went wrong : The marketplace '
+                'name is invalid!')
+            self.exit()
+        return getattr(ccxt, name)(self.keys[name])
+
+    def milliseconds(self):
+        """Current time of the marketplace: the simulated clock of the fake
+        marketplace, the wall clock for the others. Every timestamp of the
+        strategy come from it to compare them with the trades timestamps.
+        return: int, timestamp in ms."""
+        clock = getattr(self.exchange, 'milliseconds', None)
+        return clock() if clock else now_ms()
+
+    def api_requester_init(self):
+        """Create the token bucket of the selected marketplace, following its
+        rateLimit in milliseconds between two requests.
+        return: ApiRequester object."""
+        rate_limit = getattr(self.exchange, 'rateLimit', None)
+        rate = 1000 / rate_limit if rate_limit else None
+        api = ApiRequester(TokenBucket(rate), self.applog,
+            metrics=self.metrics, sleep=self.sleep)
+        if hasattr(self.exchange, 'throttle'):
+            # The pages read by one call also go through the bucket
+            self.exchange.throttle = api.bucket.acquire
+        return api
 
     def select_market(self):
         """Market selection menu.
         return: string, selected market.
         """
-        self.load_markets()
+        self.apply_markets(self.market_cache.get())
         market_list = self.exchange.symbols
-        valid_choice = False
+        valid_choice = self.headless is not None
+        if valid_choice:
+            choice = self.headless_market()
+            self.selected_market = choice
         while valid_choice is False:
             self.applog.info(f'Please enter the name of a market: {market_list}')
             choice = input(' >> ').upper()
@@ -183,41 +404,84 @@ class LazyStarter:
                     valid_choice = True
             else:
                 self.applog.info(limitation)
+        self.set_market_precision(choice)
         return choice
 
+    def apply_markets(self, cache):
+        """Give the markets read from the market cache to the marketplace, as
+        if they had been loaded by its load_markets().
+        cache: dict, with the symbols list and the markets dict."""
+        if hasattr(self.exchange, 'set_markets'):
+            # ccxt also index them by id and by currency
+            self.exchange.set_markets(cache['markets'])
+        else:
+            self.exchange.markets = cache['markets']
+        self.exchange.symbols = cache['symbols']
+
+    def fetch_market_metadata(self):
+        """Read the markets from the marketplace for the market cache. They
+        are not loaded in the marketplace object, a background refresh is
+        only used at the next start. The symbols are the ones load_markets()
+        would give: built by the marketplace when it can, sorted market
+        names like ccxt otherwise.
+        return: dict, with the symbols list and the markets dict."""
+        if hasattr(self.exchange, 'fetch_market_metadata'):
+            return self.api.call('fetch_markets',
+                self.exchange.fetch_market_metadata)
+        markets = self.api.call('fetch_markets', self.exchange.fetch_markets)
+        markets = {market['symbol']: market for market in markets}
+        return {'symbols': sorted(markets), 'markets': markets}
+
+    def set_market_precision(self, market):
+        """Read the price and amount precisions and the limits of a market
+        read from the market cache, 8 decimals when the marketplace doesn't
+        give them.
+        market: string, market name."""
+        markets = getattr(self.exchange, 'markets', None) or {}
+        market_info = markets.get(market) or {}
+        precision = market_info.get('precision') or {}
+        self.price_fp = FixedPoint.from_precision(precision.get('price'))
+        self.amount_fp = FixedPoint.from_precision(precision.get('amount'))
+        self.market_limits = market_info.get('limits') or {}
+        Order.fixed_point = self.price_fp
+
+    def minimum_amount(self, range_bot):
+        """Smallest amount of an order, worth 0.001 of quote currency at the
+        bottom of the range, or more when the market limits ask for it.
+        range_bot: Decimal, bottom of the range.
+        return: Decimal."""
+        minimum = Decimal('0.001') / range_bot
+        amount_min = (self.market_limits.get('amount') or {}).get('min')
+        if amount_min:
+            minimum = max(minimum, Decimal(str(amount_min)))
+        cost_min = (self.market_limits.get('cost') or {}).get('min')
+        if cost_min:
+            minimum = max(minimum, Decimal(str(cost_min)) / range_bot)
+        return minimum
+
     """
     ######################## DATA CHECKER/FORMATTER ###########################
     """
 
-    def log_file_reader(self):
-        """Import the last 20 order from strat.log and organize it.
+    def log_file_reader(self, nb_orders=20):
+        """Import the last orders from strat.log and its rotated segments and
+        organize them. The files are read backward from their end.
+        nb_orders: int, optional, number of orders to import.
         return: None or dict containing : list of exectuted buy, 
-                                          list of executed sell, 
-                                          dict of parameters
+                                          list of executed sell
         """
         strat_log_file = f'{self.root_path}logfiles/strat.log'
-        raw_data = []
         logs_data = {'buy': [], 'sell': []}
         # In case there is no log file
         if not self.create_file_when_none(strat_log_file):
-            self.applog.warning("params.txt file have been created")
+            self.applog.warning("strat.log file have been created")
             return
         self.applog.debug("Reading the strat.log file")
-        nb_of_lines = self.file_line_counter(strat_log_file)
+        raw_data = list(tail_order_events(strat_log_file, nb_orders))
         # In case the log file is empty
-        if not nb_of_lines:
+        if not raw_data:
             self.applog.warning('Your strat.log file was empty')
             return
-        target = nb_of_lines - 20 if nb_of_lines > 20 else 0
-        # Get the last 20 orders saved in log file
-        while target < nb_of_lines:
-            line = self.read_one_line(strat_log_file, nb_of_lines)
-            try:
-                line = json.loads(line)
-                raw_data.append(line)
-            except Exception as e:
-                target = target - 1 if target - 1 >= 0 else target
-            nb_of_lines -= 1
         # It's better when it's pretty to display
         for order in raw_data:
             formated_order = self.format_log_order(
@@ -228,10 +492,10 @@ class LazyStarter:
                     order['timestamp'],
                     order['datetime'])
             if order['side'] == 'buy'or\
-                order['side'] == 'canceled_buy':
+                order['side'] == 'cancel_buy':
                 logs_data['buy'].append(formated_order)
             if order['side'] == 'sell' or\
-                order['side'] == 'canceled_sell':
+                order['side'] == 'cancel_sell':
                 logs_data['sell'].append(formated_order)
         self.display_user_trades(logs_data)
         return logs_data
@@ -250,6 +514,13 @@ class LazyStarter:
             msg = f'Something went wrong when loading params: {e}'
             self.applog.warning(msg)
             return
+        return self.params_checker(params)
+
+    def params_checker(self, params):
+        """Check the integrity of all parameters and convert them.
+        params: dict, parameters with string values.
+        return: dict with valid parameters, or False.
+        """
         try:
             # Check if values exist
             if not params['datetime']:
@@ -312,7 +583,7 @@ class LazyStarter:
             error_message = f"params['benef_alloc'] is not an int:"
             params['benef_alloc'] = self.str_to_decimal(params['benef_alloc'],
                 error_message)
-            self.applog.debug(f'param_checker, params: {params}')
+            self.applog.debug('param_checker', params=params)
             # Test if values are correct
             self.is_date(params['datetime'])
             if params['market'] not in self.exchange.symbols:
@@ -386,18 +657,6 @@ class LazyStarter:
         with open(file_name) as f:
             return f.readlines()[line_nb].replace('\n', '').replace("'", '"')
 
-    def file_line_counter(self, file_name):
-        """Line counter for any file.
-        return: int, number of line. Start at 0."""
-        try:
-            with open(file_name, mode='r', encoding='utf-8') as log_file:
-                for i, l in enumerate(log_file):
-                    pass
-            return i
-        except NameError:
-            self.applog.info(f'{file_name} is empty')
-            return
-
     def simple_file_writer(self, file_name, text):
         """Write a text in a file.
         file_name: string, full path of the file.
@@ -464,13 +723,6 @@ class LazyStarter:
         b_dict = str(b_dict)
         return b_dict.replace("'", '"')
 
-    def timestamp_formater(self):
-        """Format time.time() into the same format as timestamp
-        used in ccxt: 13 numbers.
-        return: int, formated timestamp"""
-        timestamp = str(time()).split('.')
-        return int(timestamp[0] + timestamp[1][:3])
-
     def limitation_to_btc_market(self, market):
         """Special limitation to BTC market : only ALT/BTC for now.
         market: string, market name.
@@ -531,40 +783,28 @@ class LazyStarter:
         return True
 
     def multiplier(self, nb1, nb2, nb3=Decimal('1')):
-        """Do a simple multiplication between Decimal.
+        """Do an exact multiplication rounded to the price precision.
         nb1: Decimal.
         nb2: Decimal.
         nb3: Decimal, optional.
         return: Decimal.
         """
-        return self.quantizator(nb1 * nb2 * nb3)
+        return self.price_fp.multiplier(nb1, nb2, nb3)
 
     def quantizator(self, nb):
-        """Format a Decimal object to 8 decimals
+        """Round an amount to the amount precision of the market.
         return: Decimal"""
-        return nb.quantize(Decimal('.00000001'), rounding=ROUND_HALF_EVEN)
+        return self.amount_fp.quantize(nb)
 
     def interval_generator(self, range_bottom, range_top, increment):
-        """Generate a list of interval inside a range by incrementing values
+        """Generate the grid of prices inside a range by incrementing values
         range_bottom: Decimal, bottom of the range
         range_top: Decimal, top of the range
         increment: Decimal, value used to increment from the bottom
-        return: list, value from [range_bottom, range_top[
-        """ 
-        intervals = [range_bottom]
-        intervals.append(self.multiplier(intervals[-1], increment))
-        if range_top <= intervals[1]:
-            raise ValueError('Range top value is too low')
-        while intervals[-1] <= range_top:
-            intervals.append(self.multiplier(intervals[-1], increment))
-        del intervals[-1]
-        if len(intervals) < 6:
-            msg = (
-                    f'Range top value is too low, or increment too '
-                    f'high: need to generate at lease 6 intervals. Try again!'
-                )
-            raise ValueError(msg)
-        return intervals
+        return: Grid, value from [range_bottom, range_top[
+        """
+        return Grid.from_range(range_bottom, range_top, increment,
+            self.price_fp)
 
     def increment_coef_buider(self, nb):
         """Formating increment_coef.
@@ -612,50 +852,45 @@ class LazyStarter:
                 # When the strategy will start with spread bot inferior or
                 # equal to the actual market price
                 if params['spread_bot'] <= price:
-                    incoming_buy_funds = Decimal('0')
                     i = spread_top_index
                     # When the whole strategy is lower than actual price
                     if params['range_top'] < price:
-                        while i < len(self.intervals):
-                            incoming_buy_funds += self.multiplier(
-                                self.intervals[i], params['amount'],
-                                self.fees_coef)
-                            i +=1
+                        i = len(self.intervals)
                     # When only few sell orders are planned to be under the
                     # actual price
                     else:
                         while self.intervals[i] <= price:
-                            incoming_buy_funds += self.multiplier(
-                                self.intervals[i], params['amount'],
-                                self.fees_coef)
                             i +=1
                             # It crash when price >= range_top
                             if i == len(self.intervals):
                                 break
+                    # Sum of the quantized values of the sells filled at start
+                    incoming_buy_funds = sum(self.price_fp.mul_each(
+                        self.intervals.level_units(self.price_fp)[
+                            spread_top_index:i],
+                        params['amount'], self.fees_coef))
                     total_buy_funds_needed = total_buy_funds_needed -\
-                        incoming_buy_funds
+                        self.price_fp.to_decimal(incoming_buy_funds)
                 # When the strategy will start with spread bot superior to the
                 # actual price on the market
                 else:
-                    incoming_sell_funds = Decimal('0')
+                    # Number of buy orders filled at start
+                    incoming_sells = 0
                     i = spread_bot_index
                     # When the whole strategy is upper than actual price
                     if params['spread_bot'] > price:
-                        while i >= 0:
-                            incoming_sell_funds += self.multiplier(
-                                params['amount'], self.fees_coef)
-                            i -=1
+                        incoming_sells = i + 1
                     # When only few buy orders are planned to be upper the
                     # actual price
                     else:
                         while self.intervals[i] >= price:
-                            incoming_sell_funds += self.multiplier(
-                                params['amount'], self.fees_coef)
+                            incoming_sells += 1
                             i -=1
                             if i < 0:
                                 break
                     total_sell_funds_needed = total_sell_funds_needed\
-                    - incoming_sell_funds
+                    - self.amount_fp.to_decimal(incoming_sells *
+                        self.amount_fp.units(params['amount'], self.fees_coef))
                 msg = (
                     f'Your actual strategy require: {pair[1]} needed: '
                     f'{total_buy_funds_needed} and you have {buy_balance} '
@@ -685,24 +920,17 @@ class LazyStarter:
         amount: Decimal, allocated ALT per order
         return: Decimal, funds needed
         """
-        buy_funds_needed = Decimal('0')
-        i = 0
-        while i <= index:
-            buy_funds_needed += self.intervals[i] * amount
-            i += 1
-        return buy_funds_needed
+        prices = sum(self.intervals.level_units(self.price_fp)[:index + 1])
+        return self.price_fp.to_decimal(self.price_fp.mul(prices, amount))
 
     def calculate_sell_funds(self, index, amount):
         """Calculate the sell funds required to execute the strategy
         amount: Decimal, allocated ALT per order
         return: Decimal, funds needed
         """
-        sell_funds_needed = Decimal('0')
-        i = len(self.intervals) -1
-        while i >= index:
-            sell_funds_needed += amount
-            i -= 1
-        return sell_funds_needed
+        nb_orders = max(len(self.intervals) - index, 0)
+        return self.amount_fp.to_decimal(
+            nb_orders * self.amount_fp.units(amount))
 
     def look_for_moar_funds(self, funds_needed, funds, side):
         """Look into open orders how much funds there is, offer to cancel orders not
@@ -718,16 +946,16 @@ class LazyStarter:
         # strategy
         if side == 'buy':
             for order in orders['buy']:
-                if order[1] in self.intervals\
-                or order[1] == self.safety_buy_value:
-                    funds += order[1] * order[2]
+                if order.price in self.intervals\
+                or order.price == self.safety_buy_value:
+                    funds += order.price * order.amount
                 else:
                     orders_outside_strat.append(order)
         else:
             for order in orders['sell']:
-                if order[1] in self.intervals\
-                or order[1] == self.safety_sell_value:
-                    funds += order[2]
+                if order.price in self.intervals\
+                or order.price == self.safety_sell_value:
+                    funds += order.amount
                 else:
                     orders_outside_strat.append(order)
         # If there is still not enough funds but there is open orders outside the
@@ -747,14 +975,14 @@ class LazyStarter:
                         rsp = self.ask_to_select_in_a_list(q, 
                             orders_outside_strat)
                         del orders_outside_strat[rsp]
-                        rsp = self.cancel_order(orders_outside_strat[rsp][0],
-                            orders_outside_strat[rsp][1],
-                            orders_outside_strat[rsp][4], side)
+                        rsp = self.cancel_order(orders_outside_strat[rsp].id,
+                            orders_outside_strat[rsp].price,
+                            orders_outside_strat[rsp].timestamp, side)
                         if rsp:
                             if side == 'buy':
-                                funds += order[1] * order[2]
+                                funds += order.price * order.amount
                             else:
-                                funds += order[2]
+                                funds += order.amount
                             self.stratlog.debug(
                                 f'You have now {funds} {side} '
                                 f'funds and you need {funds_needed}.')
@@ -766,11 +994,14 @@ class LazyStarter:
     ######################### USER INTERACTION ################################
     """
 
-    def simple_question(self, q): #Fancy things can be added
+    def simple_question(self, q, policy=None): #Fancy things can be added
         """Simple question prompted and response handling.
         q: string, the question to ask.
+        policy: string, optional, key of the answer in headless mode.
         return: boolean True or None, yes of no
         """
+        if self.headless is not None:
+            return bool(self.headless_answer(q, policy))
         while True:
             self.applog.info(q)
             choice = input(' >> ')
@@ -800,11 +1031,21 @@ class LazyStarter:
             except Exception as e:
                 self.applog.info(f'{q} invalid choice: {choice} -> {e}')
 
-    def ask_to_select_in_a_list(self, q, a_list):
+    def ask_to_select_in_a_list(self, q, a_list, policy=None):
         """Ask to the user to choose between items in a list
         a_list: list.
         q: string.
+        policy: string, optional, key of the answer in headless mode, the
+            number the user would enter.
         return: int, the position of this item """
+        if self.headless is not None:
+            choice = self.str_to_int(self.headless_answer(f'{q} {a_list}',
+                policy))
+            if not 0 < choice <= len(a_list):
+                self.applog.critical(f'{policy} must be between 1 and '
+                    f'{len(a_list)}')
+                self.exit()
+            return choice - 1
         self.applog.info(q)
         q = ''
         for i, item in enumerate(a_list, start=1):
@@ -846,7 +1087,7 @@ class LazyStarter:
     def ask_param_amount(self, range_bot):
         """Ask the user to enter a value of ALT to sell at each order.
         return: decimal."""
-        minimum_amount = Decimal('0.001') / range_bot
+        minimum_amount = self.minimum_amount(range_bot)
         q = (
             f'How much {self.selected_market[:4]} do you want to sell '
             f'per order? It must be between {minimum_amount} and 10000000:')
@@ -890,7 +1131,10 @@ class LazyStarter:
         return: dict, of decimal values
         """
         price = self.get_market_last_price(self.selected_market)
-        msg = f'The actual price of {self.selected_market} is {price}'
+        msg = (
+            f'The actual price of {self.selected_market} is {price}, the '
+            f'closest price in the list is '
+            f'{self.intervals[self.intervals.nearest_index(price)]}')
         self.applog.info(msg)
         q = (
             f'Please select the price of your highest buy order '
@@ -951,10 +1195,26 @@ class LazyStarter:
         self.simple_file_writer(file_path, self.dict_to_str(self.params))
         return True
 
+    def headless_params(self):
+        """Set the parameters of the headless mode, given by its config or
+        read from params.txt, then checked like the ones the user enter.
+        """
+        file_path = os.path.join(self.root_path, self.headless['params_file'])
+        if self.headless.get('params'):
+            params = self.params_checker({key: str(value) for key, value
+                in self.headless['params'].items()})
+        else:
+            params = self.params_reader(file_path)
+        if not params:
+            self.applog.critical('The headless mode need valid parameters')
+            self.exit()
+        self.params = self.check_for_enough_funds(params)
+        self.simple_file_writer(file_path, self.dict_to_str(self.params))
+
     def enter_params(self):
         """Series of questions to setup LW parameters.
         return: dict, valid parameters """
-        params = {'datetime': datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f'),
+        params = {'datetime': ms_to_str(self.milliseconds()),
                   'market'  : self.selected_market}
         params.update(self.ask_range_setup())
         params.update({'amount': self.ask_param_amount(params['range_bot'])})
@@ -1023,205 +1283,151 @@ class LazyStarter:
 
     def fetch_balance(self):
         """Get account balance from the marketplace.
-        Retry 1000 times when error and send a mail each 10 tries.
+        Retry with an exponential backoff when error.
         return: dict, formated balance by ccxt."""
-        try:
-            return self.exchange.fetch_balance()
-        except Exception as e:
-            logging.warning(f'WARNING: {e}')
-            sleep(0.5)
-            self.err_counter += 1
-            if self.err_counter >= 10:
-                #send mail
-                self.applog.warning('api error >= 10')
-                self.err_counter = 0
-            return self.fetch_balance()
-
-    def load_markets(self):
-        """Load the market list from a marketplace to self.exchange.
-        Retry 1000 times when error and send a mail each 10 tries.
-        """
-        try:
-            self.exchange.load_markets()
-        except Exception as e:
-            logging.warning(f'WARNING: {e}')
-            sleep(0.5)
-            self.err_counter += 1
-            if self.err_counter >= 10:
-                #send mail
-                self.applog.warning('api error >= 10')
-                self.err_counter = 0
-            self.load_markets()
+        return self.api.call('fetch_balance', self.exchange.fetch_balance)
 
     def fetch_open_orders(self, market):
         """Get open orders of a market from a marketplace.
-        Retry 1000 times when error and send a mail each 10 tries.
+        Retry with an exponential backoff when error.
         market: string, market name.
         return: list, formatted open orders by ccxt."""
-        try:
-            return self.exchange.fetch_open_orders(market)
-        except Exception as e:
-            logging.warning(f'WARNING: {e}')
-            sleep(0.5)
-            self.err_counter += 1
-            if self.err_counter >= 10:
-                #send mail
-                self.applog.warning('api error >= 10')
-                self.err_counter = 0
-            return self.fetch_open_orders(market)
-
-    def fetch_trades(self, market):
+        return self.api.call('fetch_open_orders',
+            self.exchange.fetch_open_orders, market)
+
+    def fetch_trades(self, market, since=None):
         """Get trading history of a market from a marketplace.
-        Retry 1000 times when error and send a mail each 10 tries.
+        Retry with an exponential backoff when error.
         market: string, market name.
+        since: int, optional, timestamp in ms of the oldest trade wanted.
         return: list, formatted trade history by ccxt."""
-        try:
-            return self.exchange.fetch_trades(market)
-        except Exception as e:
-            logging.warning(f'WARNING: {e}')
-            sleep(0.5)
-            self.err_counter += 1
-            if self.err_counter >= 10:
-                #send mail
-                self.applog.warning('api error >= 10')
-                self.err_counter = 0
-            return self.fetch_trades(market)
+        return self.api.call('fetch_trades', self.exchange.fetch_trades,
+            market, since)
+
+    def fetch_my_trades(self, market, since):
+        """Get the user trades of a market done since a timestamp.
+        Retry with an exponential backoff when error.
+        market: string, market name.
+        since: int, timestamp in ms.
+        return: list, formatted trades by ccxt, my_trades_limit at most on
+            ccxt marketplaces, the next ones come at the next call."""
+        return self.api.call('fetch_my_trades', self.exchange.fetch_my_trades,
+            market, since, self.my_trades_limit)
 
     def fetch_ticker(self, market):
         """Get ticker info of a market from a marketplace.
-        Retry 1000 times when error and send a mail each 10 tries.
+        Retry with an exponential backoff when error.
         market: string, market name.
         return: list, formatted trade history by ccxt."""
-        try:
-            return self.exchange.fetch_ticker(market)
-        except Exception as e:
-            logging.warning(f'WARNING: {e}')
-            sleep(0.5)
-            self.err_counter += 1
-            if self.err_counter >= 10:
-                #send mail
-                self.applog.warning('api error >= 10')
-                self.err_counter = 0
-            return self.fetch_ticker(market)
+        return self.api.call('fetch_ticker', self.exchange.fetch_ticker,
+            market)
 
     def init_limit_buy_order(self, market, amount, price):
         """Generate a timestamp before creating a buy order."""
-        self.now = self.timestamp_formater()
+        self.now = self.milliseconds()
         return self.create_limit_buy_order(market, amount, price)
 
     def create_limit_buy_order(self, market, amount, price):
         """Create a limit buy order on a market of a marketplace.
-        Retry 1000 times when error and send a mail each 10 tries.
+        Retry with an exponential backoff when error, after checking that the
+        order have not been created.
         market: string, market name.
         amount: string, amount of ALT to buy.
         price: string, price of the order.
         return: list, formatted trade history by ccxt."""
-        try:
+        def place_order():
             order = self.exchange.create_limit_buy_order(market, amount, price)
+            self.metrics.inc('orders_placed_total', side='buy')
             date = self.order_logger_formatter('buy', order['id'], price,
-                amount, self.timestamp_formater(),
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f'))
+                amount, self.milliseconds())
             return self.format_order(order['id'], price, amount,
-                date[0], date[1])
-        except Exception as e:
-            logging.warning(f'WARNING: {e}')
-            sleep(0.5)
-            self.err_counter += 1
-            if self.err_counter >= 10:
-                #send mail
-                self.applog.warning('api error >= 10')
-                self.err_counter = 0
-            rsp = self.check_limit_order(market, price,'buy')
-            if not rsp:
-                return self.create_limit_buy_order(market, amount, price)
-            else:
-                return rsp
+                date[0], date[1], 'buy')
+        return self.api.call('create_limit_buy_order', place_order,
+            recover=lambda: self.check_limit_order(market, price, 'buy') or None)
 
     def set_several_buy(self, start_index, target, benef_alloc=None):
-        """Loop for opening buy orders. It generate amount to split benef
-        following benef alloc.
-        market: string, market name.
-        amount: string, amount of ALT to buy.
-        price: string, price of the order.
+        """Open buy orders from start_index to target. It generate amount to
+        split benef following benef alloc.
         start_index: int, from where the loop start in self.intervals.
         target: int, from where the loop start in self.intervals.
+        benef_alloc: bool, optional, apply the benefice allocation.
         return: list, of executed orders.
         """
-        buy_orders = []
         if benef_alloc:
             amount = []
             start_index_copy = start_index
             while start_index_copy <= target:
-                btc_won = self.multiplier(self.intervals[start_index_copy + 1],
-                    self.params['amount'], self.fees_coef)
-                btc_to_spend = self.multiplier(self.intervals[start_index_copy],
-                    self.params['amount'], self.fees_coef)
-                total = ((btc_won - btc_to_spend) * Decimal(
-                    self.params['benef_alloc']) / Decimal('100') + \
-                    btc_to_spend) / self.intervals[start_index_copy]
+                total = rebuy_amount(self.intervals[start_index_copy],
+                    self.intervals[start_index_copy + 1], self.params['amount'],
+                    self.fees_coef, Decimal(self.params['benef_alloc']),
+                    self.multiplier)
                 amount.append(self.quantizator(total))
                 start_index_copy += 1
         else:
-            amount = [self.params['amount'] for x in range(target - start_index)]
-        i = 0
-        while start_index <= target:
-            order = self.init_limit_buy_order(self.selected_market, amount[i],
-                self.intervals[start_index])
-            buy_orders.append(order)
-            start_index += 1
-            i += 1
-        return buy_orders
+            amount = [self.params['amount'] for x in range(
+                target - start_index + 1)]
+        return self.set_several_orders('buy',
+            self.intervals[start_index:target + 1], amount)
 
     def init_limit_sell_order(self, market, amount, price):
         """Generate a global timestamp before calling """
-        self.now = self.timestamp_formater()
+        self.now = self.milliseconds()
         return self.create_limit_sell_order(market, amount, price)
 
     def create_limit_sell_order(self, market, amount, price):
         """Create a limit sell order on a market of a marketplace.
-        Retry 1000 times when error and send a mail each 10 tries.
+        Retry with an exponential backoff when error, after checking that the
+        order have not been created.
         market: string, market name.
         amount: string, amount of ALT to sell.
         price: string, price of the order.
         return: list, formatted trade history by ccxt
                 or boolean True when the order is already filled"""
-        try:
-            order = self.exchange.create_limit_sell_order(market, str(amount), str(price))
+        def place_order():
+            order = self.exchange.create_limit_sell_order(market, str(amount),
+                str(price))
+            self.metrics.inc('orders_placed_total', side='sell')
             date = self.order_logger_formatter('sell', order['id'], price,
-                amount, self.timestamp_formater(),
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f'))
+                amount, self.milliseconds())
             return self.format_order(order['id'], price, amount,
-                date[0], date[1])
-        except Exception as e:
-            logging.warning(f'WARNING: {e}')
-            sleep(0.5)
-            self.err_counter += 1
-            if self.err_counter >= 10:
-                #send mail
-                self.applog.warning('api error >= 10')
-                self.err_counter = 0
-            rsp = self.check_limit_order(market, price,'sell')
-            if not rsp:
-                return self.create_limit_sell_order(market, amount, price)
-            else:
-                return rsp
+                date[0], date[1], 'sell')
+        return self.api.call('create_limit_sell_order', place_order,
+            recover=lambda: self.check_limit_order(market, price, 'sell') or None)
 
     def set_several_sell(self, start_index, target):
-        """Loop for opening sell orders.
-        market: string, market name.
-        amount: string, amount of ALT to sell.
-        price: string, price of the order.
+        """Open sell orders from start_index to target.
         start_index: int, from where the loop start in self.intervals.
         target: int, from where the loop start in self.intervals.
         return: list, of executed orders.
         """
-        sell_orders = []
-        while start_index <= target:
-            order = self.init_limit_sell_order(self.selected_market,
-                self.params['amount'], self.intervals[start_index])
-            sell_orders.append(order)
-            start_index += 1
-        return sell_orders
+        prices = self.intervals[start_index:target + 1]
+        return self.set_several_orders('sell', prices,
+            [self.params['amount'] for x in prices])
+
+    def set_several_orders(self, side, prices, amounts):
+        """Open a batch of limit orders concurrently. There is never more than
+        self.max_orders_in_flight orders waiting for an answer. Orders which
+        fail go through the check_limit_order() recovery of
+        create_limit_xxx_order().
+        side: string, buy or sell.
+        prices: list, of Decimal, prices of the orders in grid order.
+        amounts: list, of Decimal, amount of each order.
+        return: list, of executed orders in the same order as prices.
+        """
+        if side == 'buy':
+            create_order = self.create_limit_buy_order
+        else:
+            create_order = self.create_limit_sell_order
+        # One timestamp for the whole batch, check_limit_order() look for
+        # trades done after it
+        self.now = self.milliseconds()
+        workers = min(self.max_orders_in_flight, len(prices))
+        if workers < 2:
+            return [create_order(self.selected_market, amount, price)
+                    for price, amount in zip(prices, amounts)]
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(create_order, repeat(self.selected_market),
+                amounts, prices))
 
     def check_limit_order(self, market, price, side):
         """Verify if an order have been correctly created despite API error
@@ -1229,7 +1435,7 @@ class LazyStarter:
         price: string, price of the order.
         side: string, buy or sell
         return: list, in a formatted order"""
-        sleep(0.5)
+        self.sleep(0.5)
         orders = self.get_orders(market)[side]
         is_open = self.does_an_order_is_open(price, orders)
         if is_open:
@@ -1247,7 +1453,7 @@ class LazyStarter:
         a_list: list, user trade history.
         return: boolean."""
         for item in a_list:
-            if item[1] == target:
+            if item.price == target:
                 return item
         return False
 
@@ -1262,20 +1468,21 @@ class LazyStarter:
             coef = Decimal('2') - Decimal(self.params['increment_coef']) +\
                 Decimal('0.001')
             for item in a_list:
-                if item[4] >= timestamp:
-                    if target * coef <= item[1] <= target:
+                if item.timestamp >= timestamp:
+                    if target * coef <= item.price <= target:
                         return True
         if side == 'sell':
             coef = self.params['increment_coef'] - Decimal('0.001')
             for item in a_list:
-                if item[4] >= timestamp:
-                    if target * coef >= item[1] >= target:
+                if item.timestamp >= timestamp:
+                    if target * coef >= item.price >= target:
                         return True
         return False
 
     def cancel_order(self, order_id, price, timestamp, side):
         """Cancel an order with it's id.
-        Retry 1000 times, send an email each 10 tries.
+        Retry with an exponential backoff when error, as long as the order is
+        still open.
         Warning : Not connard proofed!
         order_id: string, marketplace order id.
         price: string, price of the order.
@@ -1284,59 +1491,48 @@ class LazyStarter:
         return: boolean, True if the order is canceled correctly, False when the 
         order have been filled before it's cancellation"""
         cancel_side = 'cancel_buy' if side == 'buy' else 'cancel_sell'
-        try:
-            self.applog.debug(f'Init cancel {side} order {order_id} {price}')
-            rsp = self.exchange.cancel_order(order_id)
-            if rsp:
-                self.order_logger_formatter(cancel_side, order_id, price,
-                0, self.timestamp_formater(),
-                datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f'))
-                return True
-            else:
-                msg = (
-                        f'The {side} {order_id} have been filled '
-                        f'before being canceled'
-                    )
-                self.stratlog.warning(msg)
-                return rsp
-        except Exception as e:
-            logging.warning(f'WARNING: {e}')
-            #return self.retry_cancel_order(order_id, side)
-            sleep(0.5)
-            self.err_counter += 1
-            if self.err_counter >= 10:
-                #send mail
-                self.stratlog.warning('api error >= 10')
-                self.err_counter = 0
-            orders = self.get_orders(self.selected_market)[side]
-            is_open = self.does_an_order_is_open(price, orders)
-            if is_open:
-                rsp = self.exchange.cancel_order(order_id)
-                if rsp:
-                    self.err_counter = 0
-                    return rsp
-            trades = self.get_user_history(self.selected_market)[side]
-            is_traded = self.order_in_history(price, trades, side, timestamp)
-            if is_traded:
-                msg = (
-                        f'The {side} {order_id} have been filled '
-                        f'before being canceled'
-                    )
-                self.stratlog.warning(msg)
-                return False
-            else:
-                self.order_logger_formatter(cancel_side, order_id, price,
-                    0, self.timestamp_formater(),
-                    datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f'))
-                return True
+        self.applog.debug('Init cancel order', side=side, order_id=order_id,
+            price=price)
+        rsp = self.api.call('cancel_order', self.exchange.cancel_order,
+            order_id, recover=lambda: self.check_cancel_order(price,
+                timestamp, side))
+        if rsp:
+            self.metrics.inc('orders_cancelled_total', side=side)
+            self.order_logger_formatter(cancel_side, order_id, price,
+                0, self.milliseconds())
+            # A canceled order is never reconciled, it leaves the ledger now
+            order = self.open_orders.get_by_id(order_id)
+            if order:
+                self.open_orders[side].remove(order)
+            return True
+        else:
+            msg = (
+                    f'The {side} {order_id} have been filled '
+                    f'before being canceled'
+                )
+            self.stratlog.warning(msg)
+            return False
+
+    def check_cancel_order(self, price, timestamp, side):
+        """Verify if an order have been canceled or filled despite API error.
+        price: string, price of the order.
+        timestamp: int, timestamp of the order.
+        side: string, buy or sell.
+        return: None when the order is still open, False when it have been
+            filled, True when it is canceled."""
+        orders = self.get_orders(self.selected_market)[side]
+        if self.does_an_order_is_open(price, orders):
+            return None
+        trades = self.get_user_history(self.selected_market)[side]
+        return not self.order_in_history(price, trades, side, timestamp)
 
     def cancel_all(self, open_orders):
         if open_orders['buy']:
             for item in open_orders['buy']:
-                self.cancel_order(item[0], item[1], item[4], 'buy')
+                self.cancel_order(item.id, item.price, item.timestamp, 'buy')
         if open_orders['sell']:
             for item in open_orders['sell']:
-                self.cancel_order(item[0], item[1], item[4], 'sell')
+                self.cancel_order(item.id, item.price, item.timestamp, 'sell')
 
     """
     ###################### API REQUESTS FORMATTERS ############################
@@ -1368,80 +1564,90 @@ class LazyStarter:
             self.stratlog.info(f'{key}: {value}')
         return
 
-    def format_order(self, order_id, price, amount, timestamp, date):
-        """Sort the information of an order in a list of 6 items.
+    def format_order(self, order_id, price, amount, timestamp, date,
+        side=None):
+        """Build an Order, its value is computed when needed.
         id: string, order unique identifier.
         price: float.
         amount: float.
         timestamp: int.
         date: string.
-        return: list, containing: id, price, amount, value, timestamp and date.
+        side: string, optional, buy or sell.
+        return: Order object.
         """
-        return [order_id, Decimal(str(price)), Decimal(str(amount)),\
-                Decimal(str(price)) * Decimal(str(amount)) * self.fees_coef,\
-                timestamp, date]
+        return Order(order_id, price, amount, timestamp, date, side)
 
     def format_log_order(self, side, order_id, price, amount, timestamp, date):
-        """Sort the information of an order in a list of 6 items.
+        """Build an Order from an order event of strat.log.
+        side: string, buy, cancel_buy, sell or cancel_sell.
         id: string, order unique identifier.
         price: float.
         amount: float.
         timestamp: int.
         date: string.
-        return: list, containing: id, price, amount, value, timestamp and date.
+        return: Order object.
         """
-        return [side, order_id, Decimal(str(price)), Decimal(str(amount)),\
-                Decimal(str(price)) * Decimal(str(amount)) * self.fees_coef,\
-                timestamp, date]
+        return Order(order_id, price, amount, timestamp, date, side)
 
     def get_orders(self, market):
         """Get actives orders from a marketplace and organize them.
         return: dict, containing list of buys & sells.
         """
-        orders = {'sell': [], 'buy': []}
-        raw_orders = self.fetch_open_orders(market)
-        for order in raw_orders:
-            formated_order = self.format_order(
-                    order['id'],
-                    order['price'],
-                    order['amount'],
-                    order['timestamp'],
-                    order['datetime'])
-            if order['side'] == 'buy':
-                orders['buy'].append(formated_order)
-            if order['side'] == 'sell':
-                orders['sell'].append(formated_order)
-        return orders
+        return self.orders_by_side(self.fetch_open_orders(market))
 
     def orders_price_ordering(self, orders):
         """Ordering open orders in their respective lists.
-        list[0][1] is the lowest value.
+        list[0].price is the lowest value.
         orders: dict, containing list of buys & sells.
         return: dict, ordered lists of buys & sells."""
         if orders['buy']:
-            orders['buy'] = sorted(orders['buy'], key=itemgetter(1))
+            orders['buy'] = sorted(orders['buy'], key=attrgetter('price'))
         if orders['sell']:
-            orders['sell'] = sorted(orders['sell'], key=itemgetter(1))
+            orders['sell'] = sorted(orders['sell'], key=attrgetter('price'))
         return orders
 
     def get_user_history(self, market):
-        """Get orders history from a marketplace and organize them.
+        """Get orders history and organize them. The history of the selected
+        market is read from the state store, once the fills done since the
+        last cycle have been polled.
         return: dict, containing list of buy & list of sell.
         """
-        orders = {'sell': [], 'buy': []}
-        raw_orders = self.fetch_trades(market)
-        for order in raw_orders:
-            formated_order = self.format_order(
-                    order['id'],
-                    order['price'],
-                    order['amount'],
-                    order['timestamp'],
-                    order['datetime'])
-            if order['side'] == 'buy':
-                orders['buy'].append(formated_order)
-            if order['side'] == 'sell':
-                orders['sell'].append(formated_order)
-        return orders
+        if self.trade_history and market == self.selected_market:
+            self.poll_fills()
+            return self.trade_history.trades()
+        return self.fetch_user_history(market)
+
+    def poll_fills(self):
+        """Read the new fills of the selected market and record them in the
+        trade history. They wait in pending_fills for take_fills().
+        Error recoveries of concurrent orders can poll at the same time."""
+        with self.fill_lock:
+            fills = self.fill_detector.poll()
+            if self.trade_history:
+                self.trade_history.record(fills)
+            self.pending_fills.extend(fills)
+
+    def take_fills(self):
+        """return: list, of Fill done since the last call."""
+        self.poll_fills()
+        with self.fill_lock:
+            fills, self.pending_fills = self.pending_fills, []
+        return fills
+
+    def fetch_user_history(self, market, since=None):
+        """Get orders history from a marketplace and organize them.
+        since: int, optional, timestamp in ms of the oldest trade wanted.
+        return: dict, containing list of buy & list of sell."""
+        return self.orders_by_side(self.fetch_trades(market, since))
+
+    def orders_by_side(self, orders):
+        """Build the Order records of a marketplace answer, a lean
+        marketplace already give Order records.
+        orders: list, of orders formatted by ccxt or of Order objects.
+        return: dict, containing list of buys & sells."""
+        if getattr(self.exchange, 'lean', False):
+            return Order.by_side(orders)
+        return Order.from_ccxt_list(orders)
 
     def display_user_trades(self, orders):
         """Pretify and display orders list.
@@ -1460,26 +1666,33 @@ class LazyStarter:
         order: dict.
         return: string."""
         return (
-                f'{order[0]} on: {order[6]}, id: {order[1]}, price: {order[2]}, '
-                f'amount: {order[3]}, value: {order[4]}, timestamp: {order[5]}'
+                f'{order.side} on: {order.date}, id: {order.id}, price: '
+                f'{order.price}, amount: {order.amount}, value: {order.value}, '
+                f'timestamp: {order.timestamp}'
                )
 
     def order_logger_formatter(self, side, order_id, price, amount, timestamp,\
-        datetime):
+        datetime=None):
         """Format into a string an order for the logger
         side : string. buy, cancel_buy, sell or cancel_sell
         order_id: string, order id on the marketplace.
         price: Decimal.
         amount: Decimal.
-        timestamp: int, formated timestamp.
-        datetime: string, formated datetime.
+        timestamp: int, timestamp in ms.
+        datetime: string, optional, formated datetime, the UTC date of
+            timestamp by default.
         return: tuple with timestamp and datetime"""
+        if datetime is None:
+            datetime = ms_to_str(timestamp)
         msg = (
                 f'{{"side": "{str(side)}", "order_id": "{str(order_id)}", '
                 f'"price": "{str(price)}", "amount": "{str(amount)}", '
                 f'"timestamp": "{str(timestamp)}", "datetime": "{str(datetime)}" }}'
             )
         self.stratlog.warning(msg)
+        if self.state_store:
+            self.state_store.record_event(self.selected_market, side,
+                order_id, price, amount, timestamp, datetime)
         return timestamp, datetime
 
     """
@@ -1494,14 +1707,14 @@ class LazyStarter:
         """
         self.stratlog.debug('strat_init()')
         # Add funds locker value in intervals
-        self.intervals = [self.safety_buy_value] + self.intervals + \
-            [self.safety_sell_value]
-        self.max_sell_index = len(self.intervals) - 2
+        self.intervals = self.intervals.with_safety_levels(
+            self.safety_buy_value, self.safety_sell_value, self.price_fp)
+        self.max_sell_index = self.intervals.highest_level_index
         # In case there is an old safety orders
         open_orders = self.remove_safety_order(self.orders_price_ordering(
             self.get_orders(self.selected_market)))
         #self.stratlog.debug(f'strat_init, open_orders: {open_orders}')
-        remaining_orders_price = {'sell': [], 'buy': []}
+        remaining_orders_price = {'sell': set(), 'buy': set()}
         orders_to_remove = {'sell': [], 'buy': []}
         q = 'Do you want to remove this order ? (y or n)'
         q2 = (
@@ -1511,12 +1724,12 @@ class LazyStarter:
             f'Those orders have the same price that is used by the strategy. '
             f'Which one of the two do you want to cancel : ')
         if self.intervals.index(self.params['spread_bot'])\
-        - self.params['nb_buy_to_display'] > 1\
+        - self.params['nb_buy_to_display'] > self.intervals.lowest_level_index\
         and self.params['nb_buy_to_display'] != 0:
             lowest_buy = self.intervals[self.intervals.index(
                 self.params['spread_bot']) - self.params['nb_buy_to_display']]
         else:
-            lowest_buy = self.intervals[1]
+            lowest_buy = self.intervals[self.intervals.lowest_level_index]
         if self.intervals.index(self.params['spread_top'])\
         + self.params['nb_sell_to_display'] < self.max_sell_index\
         and self.params['nb_sell_to_display'] != 0:
@@ -1524,72 +1737,84 @@ class LazyStarter:
                 self.params['spread_top']) + self.params['nb_sell_to_display']]
         else:
             highest_sell = self.intervals[self.max_sell_index]
-        self.stratlog.debug(
-            f'self.intervals: {self.intervals}, open_orders: {open_orders}, '
-            f'self.max_sell_index: {self.max_sell_index}, '
-            f'lowest_buy: {lowest_buy}, self.params["spread_bot"]: '
-            f"{self.params['spread_bot']}, self.params['spread_top']: "
-            f"{self.params['spread_top']}, highest_sell: {highest_sell}")
+        self.stratlog.debug('strat_init', intervals=self.intervals,
+            open_orders=open_orders, max_sell_index=self.max_sell_index,
+            lowest_buy=lowest_buy, spread_bot=self.params['spread_bot'],
+            spread_top=self.params['spread_top'], highest_sell=highest_sell)
         # Unwanted buy orders for the strategy handler
         for i, order in enumerate(open_orders['buy']):
-            if order[1] in self.intervals:
-                if not lowest_buy <= order[1] <=  self.params['spread_bot']:
-                    self.cancel_order(order[0], order[1], order[4], 'buy')
+            if order.price in self.intervals:
+                if not lowest_buy <= order.price <=  self.params['spread_bot']:
+                    self.cancel_order(order.id, order.price,
+                        order.timestamp, 'buy')
                     orders_to_remove['buy'].append(i)
                     continue
-                if order[2] != self.params['amount']:
-                    if self.simple_question(f'{order} {q2}'):
-                        self.cancel_order(order[0], order[1], order[4], 'buy')
+                if order.amount != self.params['amount']:
+                    if self.simple_question(f'{order} {q2}',
+                        'cancel_wrong_amount'):
+                        self.cancel_order(order.id, order.price,
+                            order.timestamp, 'buy')
                         orders_to_remove['buy'].append(i)
                         continue
             else:
-                if self.simple_question(f'{q} {order}'):
-                    self.cancel_order(order[0], order[1], order[4], 'buy')
+                if self.simple_question(f'{q} {order}', 'cancel_off_strat'):
+                    self.cancel_order(order.id, order.price,
+                        order.timestamp, 'buy')
                 orders_to_remove['buy'].append(i)
                 continue
             # Two order of the same price could crash the bot
             if i > 0:
-                if order[1] == open_orders['buy'][i - 1][1]\
+                if order.price == open_orders['buy'][i - 1].price\
                 and i - 1 not in orders_to_remove['buy']:
                     order_to_select = [order, open_orders['buy'][i - 1]]
-                    rsp = int(self.ask_to_select_in_a_list(q3, order_to_select))
-                    if rsp == 1:
-                        self.cancel_order(order[0], order[1], order[4], 'buy')
+                    rsp = int(self.ask_to_select_in_a_list(q3, order_to_select,
+                        'duplicate_order'))
+                    # rsp is the position of the order to cancel in the list
+                    if rsp == 0:
+                        self.cancel_order(order.id, order.price,
+                            order.timestamp, 'buy')
                         orders_to_remove['buy'].append(i)
                     else:
-                        self.cancel_order(order_to_select[1][0],
-                            order_to_select[1][1],
-                            order_to_select[1][4], 'buy')
+                        self.cancel_order(order_to_select[1].id,
+                            order_to_select[1].price,
+                            order_to_select[1].timestamp, 'buy')
                         orders_to_remove['buy'].append(i - 1)
         # Unwanted sell orders for the strategy handler
         for i, order in enumerate(open_orders['sell']):
-            if order[1] in self.intervals:
-                if not self.params['spread_top'] <= order[1] <= highest_sell:
-                    self.cancel_order(order[0], order[1], order[4], 'sell')
+            if order.price in self.intervals:
+                if not self.params['spread_top'] <= order.price <= highest_sell:
+                    self.cancel_order(order.id, order.price,
+                        order.timestamp, 'sell')
                     orders_to_remove['sell'].append(i)
                     continue
-                if order[2] != self.params['amount']:
-                    if self.simple_question(f'{order} {q2}'):
-                        self.cancel_order(order[0], order[1], order[4], 'sell')
+                if order.amount != self.params['amount']:
+                    if self.simple_question(f'{order} {q2}',
+                        'cancel_wrong_amount'):
+                        self.cancel_order(order.id, order.price,
+                            order.timestamp, 'sell')
                         orders_to_remove['sell'].append(i)
                         continue
             else:
-                if self.simple_question(f'{q} {order}'):
-                    self.cancel_order(order[0], order[1], order[4], 'sell')
+                if self.simple_question(f'{q} {order}', 'cancel_off_strat'):
+                    self.cancel_order(order.id, order.price,
+                        order.timestamp, 'sell')
                 orders_to_remove['sell'].append(i)
                 continue
             if i > 0:
-                if order[1] == open_orders['sell'][i - 1][1]\
+                if order.price == open_orders['sell'][i - 1].price\
                 and i - 1 not in orders_to_remove['sell']:
                     order_to_select = [order, open_orders['sell'][i - 1]]
-                    rsp = int(self.ask_to_select_in_a_list(q3, order_to_select))
-                    if rsp == 1:
-                        self.cancel_order(order[0], order[1], order[4], 'sell')
+                    rsp = int(self.ask_to_select_in_a_list(q3, order_to_select,
+                        'duplicate_order'))
+                    # rsp is the position of the order to cancel in the list
+                    if rsp == 0:
+                        self.cancel_order(order.id, order.price,
+                            order.timestamp, 'sell')
                         orders_to_remove['sell'].append(i)
                     else:
-                        self.cancel_order(open_orders['sell'][i - 1][0],
-                            open_orders['sell'][i - 1][1],
-                            open_orders['sell'][i - 1][4], 'sell')
+                        self.cancel_order(open_orders['sell'][i - 1].id,
+                            open_orders['sell'][i - 1].price,
+                            open_orders['sell'][i - 1].timestamp, 'sell')
                         orders_to_remove['sell'].append(i - 1)
         # Remove open orders which have been canceled
         if orders_to_remove['buy']:
@@ -1601,20 +1826,20 @@ class LazyStarter:
         # Create lists with all remaining orders price
         if open_orders['buy']:
             for order in open_orders['buy']:
-                remaining_orders_price['buy'].append(order[1])
+                remaining_orders_price['buy'].add(order.price)
         if open_orders['sell']:
             for order in open_orders['sell']:
-                remaining_orders_price['sell'].append(order[1])
-        self.stratlog.debug(
-            f'orders_to_remove: {orders_to_remove}, open_orders: {open_orders}'
-            f', remaining_orders_price: {remaining_orders_price}')
+                remaining_orders_price['sell'].add(order.price)
+        self.stratlog.debug('strat_init', orders_to_remove=orders_to_remove,
+            open_orders=open_orders,
+            remaining_orders_price=remaining_orders_price)
         return self.set_first_orders(remaining_orders_price, open_orders)
 
     def set_first_orders(self, remaining_orders_price, open_orders):
         """Open orders for the strategy.
-        remaining_orders_price: dict.
+        remaining_orders_price: dict, of sets of prices.
         open_orders: dict.
-        return: dict, of open orders used for the strategy."""
+        return: OrderLedger, of open orders used for the strategy."""
         self.stratlog.debug('set_first_orders()')
         buy_target = self.intervals.index(self.params['spread_bot'])
         lowest_sell_index = buy_target + 1
@@ -1625,52 +1850,54 @@ class LazyStarter:
         if self.params['nb_sell_to_display'] == 0:
             self.params['nb_sell_to_display'] = self.max_sell_index
         # At which index do we need to stop to add orders
-        if buy_target - self.params['nb_buy_to_display'] > 1:
+        lowest_level_index = self.intervals.lowest_level_index
+        if buy_target - self.params['nb_buy_to_display'] > lowest_level_index:
             lowest_buy_index = buy_target - self.params['nb_buy_to_display']
         else:
-            lowest_buy_index = 1
+            lowest_buy_index = lowest_level_index
         if lowest_sell_index + self.params['nb_sell_to_display']\
-        < len(self.intervals) - 2:
+        < self.max_sell_index:
             sell_target = lowest_sell_index + self.params['nb_sell_to_display']
         else:
-            sell_target = len(self.intervals.index) - 2
-        self.stratlog.debug(
-                f'buy target: {buy_target}, lowest_buy_index: '
-                f'{lowest_buy_index}, lowest_sell_index: {lowest_sell_index}, '
-                f'sell_target: {sell_target}, max_sell_index: '
-                f'{self.max_sell_index}')
+            sell_target = self.max_sell_index
+        self.stratlog.debug('set_first_orders', buy_target=buy_target,
+            lowest_buy_index=lowest_buy_index,
+            lowest_sell_index=lowest_sell_index, sell_target=sell_target,
+            max_sell_index=self.max_sell_index)
         # Open an order if needed or move an already existing open order. From
         # the lowest buy price to the highest buy price
-        while lowest_buy_index <= buy_target:
-            if self.intervals[lowest_buy_index]\
-            not in remaining_orders_price['buy']:
-                order = self.init_limit_buy_order(self.selected_market,
-                    self.params['amount'], self.intervals[lowest_buy_index])
-                new_orders['buy'].append(order)
-                sleep(0.2)
-            else:
-                for i, item in enumerate(open_orders['buy']):
-                    if item[1] == self.intervals[lowest_buy_index]:
-                        new_orders['buy'].append(item)
-                        del open_orders['buy'][i]
-                        break
-            lowest_buy_index += 1
+        new_orders['buy'] = self.merge_first_orders('buy',
+            self.intervals[lowest_buy_index:buy_target + 1],
+            remaining_orders_price['buy'], open_orders['buy'])
         # Now sell side
-        while lowest_sell_index < sell_target:
-            if self.intervals[lowest_sell_index]\
-            not in remaining_orders_price['sell']:
-                order = self.init_limit_sell_order(self.selected_market,
-                    self.params['amount'], self.intervals[lowest_sell_index])
-                new_orders['sell'].append(order)
-            else:
-                for i, item in enumerate(open_orders['sell']):
-                    if item[1] == self.intervals[lowest_sell_index]:
-                        new_orders['sell'].append(item)
-                        del open_orders['sell'][i]
-                        break
-            lowest_sell_index += 1
-        self.stratlog.debug(f'new_orders: {new_orders}')
-        return new_orders
+        new_orders['sell'] = self.merge_first_orders('sell',
+            self.intervals[lowest_sell_index:sell_target],
+            remaining_orders_price['sell'], open_orders['sell'])
+        self.stratlog.debug('set_first_orders', new_orders=new_orders)
+        return OrderLedger(new_orders)
+
+    def merge_first_orders(self, side, prices, remaining_orders_price,
+        open_orders):
+        """Keep the already opened orders of the strategy and open the missing
+        ones in one batch.
+        side: string, buy or sell.
+        prices: list, prices wanted by the strategy, in grid order.
+        remaining_orders_price: set, prices of the kept open orders.
+        open_orders: list, the kept open orders.
+        return: list, of orders in grid order."""
+        orders = []
+        missing_prices = []
+        kept_orders = {item.price: item for item in reversed(open_orders)}
+        for price in prices:
+            if price not in remaining_orders_price:
+                orders.append(None)
+                missing_prices.append(price)
+            elif price in kept_orders:
+                orders.append(kept_orders[price])
+        new_orders = iter(self.set_several_orders(side, missing_prices,
+            [self.params['amount'] for x in missing_prices]))
+        return [next(new_orders) if order is None else order
+                for order in orders]
 
     def remove_safety_order(self, open_orders, local=False):
         """Remove safety orders if there is any.
@@ -1679,100 +1906,108 @@ class LazyStarter:
             from self.open_orders set it as True
         return: dict.
         """
-        self.applog.debug(f'remove_safety_order()')
+        self.applog.debug('remove_safety_order()')
         if open_orders['buy']:
-            if open_orders['buy'][0][1] == self.safety_buy_value:
+            if open_orders['buy'][0].price == self.safety_buy_value:
                 # The safety order can be a fake order
-                if open_orders['buy'][0][0]:
-                    self.cancel_order(open_orders['buy'][0][0],
-                        open_orders['buy'][0][1], open_orders['buy'][0][4],
+                if open_orders['buy'][0].id:
+                    self.cancel_order(open_orders['buy'][0].id,
+                        open_orders['buy'][0].price,
+                        open_orders['buy'][0].timestamp,
                         'buy')
                 self.stratlog.debug(
-                    f"open_orders['buy'][0][1]: {open_orders['buy'][0][1]}")
+                    f"open_orders['buy'][0].price: {open_orders['buy'][0].price}")
                 del open_orders['buy'][0]
         if open_orders['sell']:
-            if open_orders['sell'][-1][1] == self.safety_sell_value:
-                if open_orders['sell'][-1][0]:
-                    self.cancel_order(open_orders['sell'][-1][0],
-                        open_orders['sell'][-1][1], open_orders['sell'][-1][4],
+            if open_orders['sell'][-1].price == self.safety_sell_value:
+                if open_orders['sell'][-1].id:
+                    self.cancel_order(open_orders['sell'][-1].id,
+                        open_orders['sell'][-1].price,
+                        open_orders['sell'][-1].timestamp,
                         'sell')
                 self.stratlog.debug(
-                    f"open_orders['sell'][-1][1]: {open_orders['sell'][-1][1]}")
+                    f"open_orders['sell'][-1].price: {open_orders['sell'][-1].price}")
                 del open_orders['sell'][-1]
         if local:
-            if self.open_orders['buy'][0][1] == self.safety_buy_value:
+            # Canceled safety orders already left the ledger, fake ones not
+            if self.open_orders['buy']\
+            and self.open_orders['buy'][0].price == self.safety_buy_value:
                 del self.open_orders['buy'][0]
-            if self.open_orders['sell'][-1][1] == self.safety_sell_value:
+            if self.open_orders['sell']\
+            and self.open_orders['sell'][-1].price == self.safety_sell_value:
                 del self.open_orders['sell'][-1]
             if self.open_orders['buy']:
                 self.stratlog.debug(
-                    f"self.open_orders['buy'][0][1]: "
-                    f"{self.open_orders['buy'][0][1]}")
+                    f"self.open_orders['buy'][0].price: "
+                    f"{self.open_orders['buy'][0].price}")
             if self.open_orders['sell']:
                 self.stratlog.debug(
-                    f"self.open_orders['sell'][-1][1]: "
-                    f"{self.open_orders['sell'][-1][1]}")
+                    f"self.open_orders['sell'][-1].price: "
+                    f"{self.open_orders['sell'][-1].price}")
         return open_orders
 
     def set_safety_orders(self, lowest_buy_index, highest_sell_index):
         """Add safety orders to lock funds for the strategy.
         lowest_buy_index: int.
         highest_sell_index: int."""
-        self.stratlog.debug(
-            f'set_safety_orders(), lowest_buy_index: {lowest_buy_index}, '
-            f'highest_sell_index: {highest_sell_index}')
-        if lowest_buy_index > 1:
+        self.stratlog.debug('set_safety_orders()',
+            lowest_buy_index=lowest_buy_index,
+            highest_sell_index=highest_sell_index)
+        lowest_level_index = self.intervals.lowest_level_index
+        if lowest_buy_index > lowest_level_index:
             buy_sum = Decimal('0')
-            while lowest_buy_index > 1:
+            while lowest_buy_index > lowest_level_index:
                 buy_sum += self.params['amount']\
                 * self.intervals[lowest_buy_index]
                 lowest_buy_index -= 1
-            self.open_orders['buy'].insert(0, self.init_limit_buy_order(
+            self.open_orders['buy'].add(self.init_limit_buy_order(
                 self.selected_market, buy_sum, self.intervals[0]))
         else:
-            if self.open_orders['buy'][0][1] != self.safety_buy_value:
-                self.open_orders['buy'].insert(0, self.create_fake_buy())
+            if self.open_orders['buy'][0].price != self.safety_buy_value:
+                self.open_orders['buy'].add(self.create_fake_buy())
         if highest_sell_index < self.max_sell_index:
             sell_sum = Decimal('0')
             while highest_sell_index < self.max_sell_index:
                 sell_sum += self.params['amount']
                 highest_sell_index += 1
-            self.open_orders['sell'].append(self.init_limit_sell_order(
+            self.open_orders['sell'].add(self.init_limit_sell_order(
                 self.selected_market, sell_sum, self.intervals[-1]))
         else:
-            if self.open_orders['sell'][-1][1] != self.safety_sell_value:
-                self.open_orders['sell'].append(self.create_fake_sell())
-        self.stratlog.debug(
-            f'safety buy: {self.open_orders["buy"][0]} , '
-            f'safety sell: {self.open_orders["sell"][-1]}')
+            if self.open_orders['sell'][-1].price != self.safety_sell_value:
+                self.open_orders['sell'].add(self.create_fake_sell())
+        self.stratlog.debug('set_safety_orders',
+            safety_buy=self.open_orders['buy'][0],
+            safety_sell=self.open_orders['sell'][-1])
         return
 
     def create_fake_buy(self):
         """Create a fake buy order.
-        return: list"""
-        return [None, self.safety_buy_value, 0, 0, self.timestamp_formater(),\
-            datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')]
+        return: Order object"""
+        timestamp = self.milliseconds()
+        return Order(None, self.safety_buy_value, 0, timestamp,
+            ms_to_str(timestamp), 'buy')
 
     def create_fake_sell(self):
         """Create a fake sell order.
-        return: list"""
-        return [None, self.safety_sell_value, 0, 0, self.timestamp_formater(),\
-            datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')]
+        return: Order object"""
+        timestamp = self.milliseconds()
+        return Order(None, self.safety_sell_value, 0, timestamp,
+            ms_to_str(timestamp), 'sell')
 
     def remove_orders_off_strat(self, new_open_orders):
         """Remove all orders that are not included in the strategy
         new_open_orders: dict, every open orders on the market
         return: dict, open orders wich are included in the strategy"""
-        self.stratlog.debug(
-            f'remove_orders_off_strat(), new_open_orders: {new_open_orders}')
+        self.stratlog.debug('remove_orders_off_strat()',
+            sample=self.dump_sample, new_open_orders=new_open_orders)
         orders_to_remove = {'sell': [], 'buy': []}
         if new_open_orders['buy']:
             for i, order in enumerate(new_open_orders['buy']):
-                if order[1] not in self.intervals:
+                if order.price not in self.intervals:
                     orders_to_remove['buy'].append(i)
         if new_open_orders['sell']:
             for i, order in enumerate(new_open_orders['sell']):
-                if order[1] not in self.intervals:
+                if order.price not in self.intervals:
                     orders_to_remove['buy'].append(i)
         if orders_to_remove['buy']:
             for i, index in enumerate(orders_to_remove['buy']):
@@ -1780,26 +2015,27 @@ class LazyStarter:
         if orders_to_remove['sell']:
             for i, index in enumerate(orders_to_remove['sell']):
                 del new_open_orders['sell'][index - i]
-        self.stratlog.debug(
-            f'orders_to_remove: {orders_to_remove}, new_open_orders: '
-            f'{new_open_orders}')
+        self.stratlog.debug('remove_orders_off_strat',
+            sample=self.dump_sample, orders_to_remove=orders_to_remove,
+            new_open_orders=new_open_orders)
         return new_open_orders
 
     def check_if_no_orders(self, new_open_orders):
         """Open orders when there is none on the market.
         return: dict"""
         executed_orders = {'buy': [], 'sell': []}
+        lowest_level_index = self.intervals.lowest_level_index
         self.stratlog.debug('check_if_no_orders()')
         # compare_orders() will fail without any open orders
         if not new_open_orders['buy']:
             self.stratlog.debug("not new_open_orders['buy']")
             if len(self.open_orders['buy']) > 0:
                 target = self.intervals.index(
-                    self.open_orders['buy'][0][1]) - 1
+                    self.open_orders['buy'][0].price) - 1
             else:
                 target = 0
             # When the bottom of the range is reached
-            if target < 1:
+            if target < lowest_level_index:
                 if self.params['stop_at_bot']:
                     self.stratlog.critical(
                         f'Bottom target reached! target: {target}')
@@ -1811,20 +2047,21 @@ class LazyStarter:
                     new_open_orders['buy'].insert(0, self.create_fake_buy())
             else:
                 # Or create the right number of new orders
-                if target - params['nb_buy_to_display'] >= 1:
+                if target - self.params['nb_buy_to_display']\
+                >= lowest_level_index:
                     start_index = target - self.params['nb_buy_to_display']
                 else:
-                    start_index = 1
+                    start_index = lowest_level_index
                 orders = self.set_several_buy(start_index, target)
-                new_open_orders.append(orders[0])
+                new_open_orders['buy'].append(orders[0])
                 executed_orders['buy'] = orders
-            self.stratlog.debug(
-                f'updated new_buy_orders: {new_open_orders["buy"]}')
+            self.stratlog.debug('check_if_no_orders',
+                updated_new_buy_orders=new_open_orders['buy'])
         if not new_open_orders['sell']:
             self.stratlog.debug("not new_open_orders['sell']")
             if len(self.open_orders['sell']) > 0:
                 start_index = self.intervals.index(
-                    self.open_orders['sell'][-1][1]) + 1
+                    self.open_orders['sell'][-1].price) + 1
             else:
                 start_index = self.max_sell_index
             if start_index > self.max_sell_index:
@@ -1847,52 +2084,42 @@ class LazyStarter:
                 orders = self.set_several_sell(start_index, target)
                 new_open_orders['sell'].append(orders[0])
                 executed_orders['sell'] = orders
-            self.stratlog.debug(
-                f'updated new_sell_orders: {new_open_orders["sell"]}')
-        self.stratlog.debug(f'executed_orders: {executed_orders}')
+            self.stratlog.debug('check_if_no_orders',
+                updated_new_sell_orders=new_open_orders['sell'])
+        self.stratlog.debug('check_if_no_orders',
+            executed_orders=executed_orders)
         return new_open_orders, executed_orders
 
     def compare_orders(self, new_open_orders, executed_orders):
         """Compare between open order know by LW and buy order from the
         marketplace.
         """
-        missing_orders = deepcopy(self.open_orders)
+        missing_orders = {'sell': [], 'buy': []}
         self.applog.debug('compare_orders')
         # When a buy has occurred
-        if new_open_orders['buy'][-1][1] != self.open_orders['buy'][-1][1]:
+        if new_open_orders['buy'][-1].price != self.open_orders['buy'][-1].price:
             self.stratlog.info('A buy has occurred')
-            for order in self.open_orders['buy']:
-                rsp = any(new_order[1] == order[1] \
-                for new_order in new_open_orders['buy'])
-                if rsp:
-                    missing_orders['buy'].remove(order)
-            start_index = self.intervals.index(new_open_orders['buy'][-1][1])
-            target = self.intervals.index(self.open_orders['buy'][-1][1])
+            new_prices = {new_order.price for new_order in new_open_orders['buy']}
+            missing_orders['buy'] = [order for order in self.open_orders['buy']
+                if order.price not in new_prices]
+            start_index = self.intervals.index(new_open_orders['buy'][-1].price)
+            target = self.intervals.index(self.open_orders['buy'][-1].price)
             if target - start_index > 0:
                 executed_orders['sell'] = self.set_several_sell(start_index,
                     target)
-        else:
-            missing_orders['buy'] = []
         # When a sell has occurred
-        if new_open_orders['sell'][0][1] != self.open_orders['sell'][0][1]:
+        if new_open_orders['sell'][0].price != self.open_orders['sell'][0].price:
             self.stratlog.info('A sell has occurred')
-            for order in self.open_orders['sell']:
-                rsp = any(new_order[1] == order[1] \
-                for new_order in new_open_orders['sell'])
-                if rsp:
-                    missing_orders['sell'].remove(order)
-            start_index = self.intervals.index(self.open_orders['sell'][0][1])
-            target = self.intervals.index(new_open_orders['sell'][0][1]) - 1
+            new_prices = {new_order.price for new_order in new_open_orders['sell']}
+            missing_orders['sell'] = [order for order in
+                self.open_orders['sell'] if order.price not in new_prices]
+            start_index = self.intervals.index(self.open_orders['sell'][0].price)
+            target = self.intervals.index(new_open_orders['sell'][0].price) - 1
             if target - start_index > 0:
                 executed_orders['buy'] = self.set_several_buy(start_index,
                     target, True)
-        else:
-            missing_orders['sell'] = []
-        msg = (
-                f'compare_orders, missing_orders: {missing_orders} '
-                f'executed_orders: {executed_orders}'
-            )
-        self.stratlog.debug(msg)
+        self.stratlog.debug('compare_orders', missing_orders=missing_orders,
+            executed_orders=executed_orders)
         self.update_open_orders(missing_orders, executed_orders)
         return
 
@@ -1905,118 +2132,160 @@ class LazyStarter:
             for order in missing_orders['sell']:
                 self.open_orders['sell'].remove(order)
             for order in executed_orders['buy']:
-                self.open_orders['buy'].append(order)
-            self.stratlog.debug(
-                f'self.open_orders buy: {self.open_orders["buy"]}')
+                self.open_orders['buy'].add(order)
+            self.stratlog.debug('update_open_orders', sample=self.dump_sample,
+                open_orders_buy=self.open_orders['buy'])
         if executed_orders['sell']:
             for order in missing_orders['buy']:
                 self.open_orders['buy'].remove(order)
-            for i, order in enumerate(executed_orders['sell']):
-                self.open_orders['sell'].insert(i, order)
-            self.stratlog.debug(
-                f'self.open_orders sell: {self.open_orders["sell"]}')
+            for order in executed_orders['sell']:
+                self.open_orders['sell'].add(order)
+            self.stratlog.debug('update_open_orders', sample=self.dump_sample,
+                open_orders_sell=self.open_orders['sell'])
         return
 
+    def apply_fills(self, fills):
+        """Build the open orders of the marketplace from the orders known by
+        LW and the fills detected since the last cycle.
+        fills: list, of Fill.
+        return: dict, containing ordered list of buys & sells."""
+        self.record_fills(fills)
+        new_open_orders = {'sell': [], 'buy': []}
+        for side in ('buy', 'sell'):
+            for order in self.open_orders[side]:
+                filled = self.filled_amounts.get(order.id)
+                if filled is not None and filled >= order.amount:
+                    del self.filled_amounts[order.id]
+                    continue
+                new_open_orders[side].append(order)
+        self.stratlog.debug('apply_fills', sample=self.dump_sample,
+            fills=fills, new_open_orders=new_open_orders)
+        return new_open_orders
+
+    def record_fills(self, fills):
+        """Add the fills to the filled amount of the orders of LW they
+        belong to, and record them in the state store.
+        fills: list, of Fill."""
+        for fill in fills:
+            order = self.open_orders.get_by_id(fill.order_id)
+            # Without order id, like on Zebitex, the order is found by price
+            if not order and fill.order_id is None:
+                price = fill.price
+                if price not in self.open_orders[fill.side]:
+                    price = self.intervals[self.intervals.nearest_index(price)]
+                order = self.open_orders[fill.side].get(price)
+            if not order:
+                self.stratlog.debug('Fill of an unknown order', fill=fill)
+                continue
+            self.filled_amounts[order.id] = self.filled_amounts.get(
+                order.id, Decimal('0')) + fill.amount
+            if self.state_store:
+                self.state_store.record_event(self.selected_market,
+                    f'fill_{fill.side}', order.id, order.price, fill.amount,
+                    fill.timestamp, '')
+
     def limit_nb_orders(self):
         """Cancel open orders if there is too many, open orders if there is 
         not enough of it"""
         new_open_orders = self.remove_orders_off_strat(
             self.orders_price_ordering(self.get_orders(
                 self.selected_market)))
-        self.stratlog.debug(
-            f'Limit nb orders(), new_open_orders: {new_open_orders}')
+        self.stratlog.debug('limit_nb_orders()', sample=self.dump_sample,
+            new_open_orders=new_open_orders)
         # Don't mess up if all buy orders have been filled during the cycle
         if new_open_orders['buy']:
             nb_orders = len(new_open_orders['buy'])
-            if new_open_orders['buy'][0][1] == self.safety_buy_value:
+            if new_open_orders['buy'][0].price == self.safety_buy_value:
                 nb_orders -= 1
         else:
             nb_orders = 0
-        self.stratlog.debug(
-            f'nb_orders: {nb_orders}, params["nb_buy_to_display"]: '
-            f"{self.params['nb_buy_to_display']}")
+        self.stratlog.debug('limit_nb_orders', nb_orders=nb_orders,
+            nb_buy_to_display=self.params['nb_buy_to_display'])
         # When there is too much buy orders on the order book
         if nb_orders > self.params['nb_buy_to_display']:
-            self.stratlog.debug(f'nb_orders > params["nb_buy_to_display"]')
+            self.stratlog.debug('nb_orders > params["nb_buy_to_display"]')
             # Care of the fake order
             if self.open_orders['buy']:
-                if not self.open_orders['buy'][0][0]:
+                if not self.open_orders['buy'][0].id:
                     del self.open_orders['buy'][0]
             nb_orders -= self.params['nb_buy_to_display']
             while nb_orders > 0:
-                self.cancel_order(new_open_orders['buy'][0][0],
-                    new_open_orders['buy'][0][1], new_open_orders['buy'][0][4],
+                self.cancel_order(new_open_orders['buy'][0].id,
+                    new_open_orders['buy'][0].price,
+                    new_open_orders['buy'][0].timestamp,
                     'buy')
-                if self.open_orders['buy'][-1][1] <=\
-                new_open_orders['buy'][0][1] < self.open_orders['buy'][-1][1]:
-                    del self.open_orders['buy'][0]
                 del new_open_orders['buy'][0]
                 nb_orders -= 1
         # When there is not enough buy order in the order book
         elif nb_orders < self.params['nb_buy_to_display']:
             # Ignore if the bottom of the range is reached. It's value is None
-            if self.open_orders['buy'][0][0]\
-            and self.open_orders['buy'][0][1] > self.intervals[1]:
+            if self.open_orders['buy'][0].id\
+            and self.open_orders['buy'][0].price > self.intervals[
+                self.intervals.lowest_level_index]:
                 self.stratlog.debug(
-                    f"{self.open_orders['buy'][0][1]} > {self.intervals[1]}")
+                    f"{self.open_orders['buy'][0].price} > "
+                    f"{self.intervals[self.intervals.lowest_level_index]}")
                 # Set the range of buy orders to create
-                target = self.intervals.index(self.open_orders['buy'][0][1]) - 1
+                target = self.intervals.index(self.open_orders['buy'][0].price) - 1
                 start_index = target - self.params['nb_buy_to_display']\
                     + len(self.open_orders['buy'])
-                if start_index <= 1:
-                    start_index = 1
+                if start_index <= self.intervals.lowest_level_index:
+                    start_index = self.intervals.lowest_level_index
                 orders = self.set_several_buy(start_index, target)
-                for i, order in enumerate(orders):
-                    self.open_orders['buy'].insert(i, order)
+                for order in orders:
+                    self.open_orders['buy'].add(order)
         # Don't mess up if all sell orders have been filled during the cycle
         if new_open_orders['sell']:
             nb_orders = len(new_open_orders['sell'])
-            if new_open_orders['sell'][-1][1] == self.safety_sell_value:
+            if new_open_orders['sell'][-1].price == self.safety_sell_value:
                 nb_orders -= 1
         else:
             nb_orders = 0
-        self.stratlog.debug(
-            f'nb_orders: {nb_orders}; params["nb_sell_to_display"]: '
-            f"{self.params['nb_sell_to_display']}")
+        self.stratlog.debug('limit_nb_orders', nb_orders=nb_orders,
+            nb_sell_to_display=self.params['nb_sell_to_display'])
         # When there is too much sell orders on the order book
         if nb_orders > self.params['nb_sell_to_display']:
             # Care of fake order
             if self.open_orders['sell']:
-                if not self.open_orders['sell'][-1][0]:
+                if not self.open_orders['sell'][-1].id:
                     del self.open_orders['sell'][-1]
             nb_orders -= self.params['nb_sell_to_display']
-            self.stratlog.debug(f'nb_orders to delete: {nb_orders}')
+            self.stratlog.debug('limit_nb_orders', nb_orders_to_delete=nb_orders)
             while nb_orders > 0:
-                self.cancel_order(new_open_orders['sell'][-1][0],
-                    new_open_orders['sell'][-1][1], 
-                    new_open_orders['sell'][-1][4],
+                self.cancel_order(new_open_orders['sell'][-1].id,
+                    new_open_orders['sell'][-1].price, 
+                    new_open_orders['sell'][-1].timestamp,
                     'sell')
-                if self.open_orders['sell'][-1][1] <=\
-                new_open_orders['sell'][-1][1] <= self.open_orders['sell'][-1][1]:
-                    del self.open_orders['sell'][-1]
                 del new_open_orders['sell'][-1]
                 nb_orders -= 1
         # When there is not enough sell order in the order book
         elif nb_orders < self.params['nb_sell_to_display']:
             # Ignore if the top of the range is reached
-            if self.open_orders['sell'][-1][0]\
-            and self.open_orders['sell'][-1][1] < self.intervals[-2]:
+            if self.open_orders['sell'][-1].id\
+            and self.open_orders['sell'][-1].price < self.intervals[
+                self.max_sell_index]:
                 # Set the range of sell orders to create
                 start_index = self.intervals.index(
-                    self.open_orders['sell'][-1][1]) + 1
+                    self.open_orders['sell'][-1].price) + 1
                 target = start_index + self.params['nb_sell_to_display']\
                 - len(self.open_orders['sell'])
                 if target > self.max_sell_index:
                     target = self.max_sell_index
                 orders = self.set_several_sell(start_index, target)
                 for order in orders:
-                    self.open_orders['sell'].append(order)
-        self.stratlog.debug(f'self.open_orders: {self.open_orders}')
+                    self.open_orders['sell'].add(order)
+        self.stratlog.debug('limit_nb_orders', sample=self.dump_sample,
+            open_orders=self.open_orders)
         return
 
     def exit(self):
         """Clean program exit"""
         self.applog.critical("End the program")
+        if self.metrics_exporter:
+            self.metrics_exporter.stop()
+        if self.state_store and self.fill_detector:
+            self.save_state()
+        self.stop_logging()
         sys.exit(0)
 
     def lw_initialisation(self):
@@ -2024,35 +2293,181 @@ class LazyStarter:
         """
         marketplace_name = self.select_marketplace() # temp modification
         self.selected_market = self.select_market() # temp modification
-        self.ask_for_params()
-        self.open_orders = self.strat_init()
-        self.set_safety_orders(self.intervals.index(self.open_orders['buy'][0][1]),
-            self.intervals.index(self.open_orders['sell'][-1][1]))
+        self.state_store = StateStore(
+            f'{self.root_path}{marketplace_name}_state.db')
+        if not self.resume_from_state():
+            if self.headless is not None:
+                self.headless_params()
+            else:
+                self.ask_for_params()
+            self.open_orders = self.strat_init()
+            self.set_safety_orders(
+                self.intervals.index(self.open_orders['buy'][0].price),
+                self.intervals.index(self.open_orders['sell'][-1].price))
+            # params as modified by strat_init
+            self.state_store.save_params(self.selected_market, self.params)
+            self.fill_detector = FillDetector(self.fetch_my_trades,
+                self.selected_market, self.milliseconds())
+            self.save_state(True)
+        self.trade_history = TradeHistory(self.state_store,
+            self.selected_market)
+        self.metrics_exporter = MetricsExporter(self.metrics,
+            self.metrics_file, self.metrics_interval, self.metrics_format)
+        self.metrics_exporter.start()
         self.main_loop()
 
+    def resume_from_state(self):
+        """Rebuild the strategy from the state saved by the last run, without
+        asking for parameters nor rescanning the open orders. The first cycle
+        of main_loop synchronize it with the marketplace.
+        return: bool, True when the state have been restored."""
+        params = self.state_store.last_params(self.selected_market)
+        ledger = self.state_store.load_ledger(self.selected_market)
+        if not params or not ledger['buy'] or not ledger['sell']:
+            return False
+        params = self.params_checker(params)
+        if not params:
+            return False
+        q = (
+                f'A previous run was found with those parameters: {params}. '
+                f'Do you want to resume it?'
+            )
+        if not self.simple_question(q, 'resume'):
+            return False
+        self.params = params
+        # params_checker() generated the grid
+        self.intervals = self.intervals.with_safety_levels(
+            self.safety_buy_value, self.safety_sell_value, self.price_fp)
+        self.max_sell_index = self.intervals.highest_level_index
+        self.open_orders = OrderLedger(ledger)
+        # Fills done while LW was stopped are caught by the first poll
+        since = self.state_store.get_state(self.selected_market,
+            'fill_cursor', self.milliseconds())
+        self.fill_detector = FillDetector(self.fetch_my_trades,
+            self.selected_market, since)
+        self.stratlog.info(f'Resumed from {self.state_store.file_name}, '
+            f'open orders: {self.open_orders}')
+        return True
+
+    def save_state(self, force=False):
+        """Write the order events of the cycle, the ledger and the fill cursor
+        in the state store, in one transaction.
+        force: bool, optional, rewrite the ledger even without new event."""
+        self.state_store.flush(self.selected_market, self.open_orders,
+            {'fill_cursor': self.fill_detector.cursor}, force)
+
     def main_loop(self):
         """Do the lazy whale strategy.
         Simple execution loop.
         """
+        cycle = 0
         while True:
             self.applog.debug('CYCLE START')
-            orders = self.check_if_no_orders(
-                self.remove_safety_order(self.remove_orders_off_strat(
-                    self.orders_price_ordering(
-                        self.get_orders(self.selected_market))), True))
-            self.compare_orders(orders[0], orders[1])
-            self.limit_nb_orders()
-            self.set_safety_orders(self.intervals.index(self.open_orders['buy'][0][1]),
-                self.intervals.index(self.open_orders['sell'][-1][1]))
+            cycle_start = perf_counter()
+            if cycle == 0:
+                startup = cycle_start - self.started_at
+                self.metrics.observe('startup_seconds', startup)
+                self.applog.info(f'First cycle {startup:.3f} s after start')
+            orders_before = self.orders_sent_count()
+            with self.metrics.timer('cycle_phase_seconds', phase='fetch'):
+                fills = self.take_fills()
+                # Fetching all the open orders is only needed from time to
+                # time, to catch what is not visible in the trade history
+                if cycle % self.full_sync_every == 0:
+                    self.last_price = self.get_market_last_price(
+                        self.selected_market)
+                    self.record_fills(fills)
+                    new_open_orders = self.orders_price_ordering(
+                        self.get_orders(self.selected_market))
+                    # Only the orders still open can be partially filled
+                    open_ids = {order.id for side in ('buy', 'sell')
+                                for order in new_open_orders[side]}
+                    self.filled_amounts = {order_id: value for order_id,
+                        value in self.filled_amounts.items()
+                        if order_id in open_ids}
+                elif fills:
+                    self.last_price = fills[-1].price
+                    new_open_orders = self.apply_fills(fills)
+                else:
+                    new_open_orders = None
+            self.metrics.inc('cycles_total')
+            if new_open_orders is None:
+                self.applog.debug('CYCLE STOP, no fill')
+                self.save_state()
+                self.end_cycle_metrics(cycle_start, orders_before)
+                cycle += 1
+                self.sleep(self.next_cycle_interval(0))
+                continue
+            with self.metrics.timer('cycle_phase_seconds', phase='reconcile'):
+                orders = self.check_if_no_orders(
+                    self.remove_safety_order(self.remove_orders_off_strat(
+                        new_open_orders), True))
+                self.compare_orders(orders[0], orders[1])
+            with self.metrics.timer('cycle_phase_seconds',
+                phase='limit_nb_orders'):
+                self.limit_nb_orders()
+            with self.metrics.timer('cycle_phase_seconds',
+                phase='set_safety_orders'):
+                self.set_safety_orders(
+                    self.intervals.index(self.open_orders['buy'][0].price),
+                    self.intervals.index(self.open_orders['sell'][-1].price))
             self.applog.debug('CYCLE STOP')
-            sleep(5)
+            self.save_state()
+            self.end_cycle_metrics(cycle_start, orders_before)
+            cycle += 1
+            self.sleep(self.next_cycle_interval(len(fills)))
+
+    def orders_sent_count(self):
+        """return: tuple, number of orders placed and cancelled since the
+            start."""
+        return (sum(self.metrics.value('orders_placed_total', side=side)
+                    for side in ('buy', 'sell')),
+                sum(self.metrics.value('orders_cancelled_total', side=side)
+                    for side in ('buy', 'sell')))
+
+    def end_cycle_metrics(self, cycle_start, orders_before):
+        """Observe the duration of a cycle and the orders it sent.
+        cycle_start: float, perf_counter() at the start of the cycle.
+        orders_before: tuple, orders_sent_count() at the start of the cycle.
+        """
+        self.metrics.observe('cycle_seconds', perf_counter() - cycle_start)
+        placed, cancelled = self.orders_sent_count()
+        self.metrics.observe('cycle_orders_placed', placed - orders_before[0],
+            COUNT_BUCKETS)
+        self.metrics.observe('cycle_orders_cancelled',
+            cancelled - orders_before[1], COUNT_BUCKETS)
+
+    def next_cycle_interval(self, nb_fills):
+        """Ask the scheduler how long to wait before the next cycle.
+        The price is the last one known, no ticker is asked for it.
+        nb_fills: int, number of fills detected during the cycle.
+        return: float, seconds."""
+        # The highest buy and the lowest sell are the actual spread
+        spread_bot = self.open_orders['buy'][-1].price \
+            if self.open_orders['buy'] else self.params['spread_bot']
+        spread_top = self.open_orders['sell'][0].price \
+            if self.open_orders['sell'] else self.params['spread_top']
+        budget_left = min(self.api.bucket.available(), self.api.budget_left())
+        return self.scheduler.next_interval(self.last_price, spread_bot,
+            spread_top, self.params['increment_coef'], nb_fills, budget_left)
 
     def main(self):
         self.applog.info("Program starting!")
         self.lw_initialisation()
         self.exit()
 
-LazyStarter = LazyStarter()
+
+def main():
+    parser = argparse.ArgumentParser(description='Lazy Whale market maker.')
+    parser.add_argument('--headless', nargs='?', const='', metavar='CONFIG',
+        help='run without asking anything, answers read from CONFIG, '
+             'headless.json by default')
+    args = parser.parse_args()
+    lazy_starter = LazyStarter()
+    if args.headless is not None:
+        lazy_starter.headless_init(args.headless)
+    lazy_starter.main()
+
 
 if __name__ == "__main__":
-    LazyStarter.main()
\ No newline at end of file
+    main()
\ No newline at end of file
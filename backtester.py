@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+# Vectorized backtest of the LW grid strategy over a price series
+import argparse
+import json
+from collections import namedtuple
+from decimal import Decimal
+
+import numpy as np
+
+from fixedPoint import FixedPoint
+from grid import Grid, rebuy_amount
+
+BacktestResult = namedtuple('BacktestResult', [
+    'pnl', 'base_delta', 'quote_delta', 'min_base', 'max_base',
+    'fees_base', 'fees_quote', 'nb_buys', 'nb_sells', 'window_overruns',
+    'nb_levels', 'last_price'])
+
+
+def load_price_series(file_name):
+    """Read a price series with one 'price' or 'timestamp,price' per line.
+    return: numpy array, of float prices."""
+    data = np.loadtxt(file_name, delimiter=',', ndmin=2)
+    return np.ascontiguousarray(data[:, -1], dtype=np.float64)
+
+
+def clamp_scan(lows, highs, start):
+    """Run gap[t] = min(max(gap[t - 1], lows[t]), highs[t]) over the whole
+    series without a Python loop.
+    Clamps compose into clamps, so an inclusive prefix scan (Hillis-Steele)
+    of the (low, high) pairs gives the composed clamp of each step in
+    log2(len) vectorized passes.
+    lows, highs: numpy arrays, bounds of each step, lows <= highs.
+    start: float, gap value before the first step.
+    return: numpy array, gap after each step."""
+    lows = lows.astype(np.float64)
+    highs = highs.astype(np.float64)
+    shift = 1
+    while shift < len(lows):
+        # Apply the earlier composed clamp first, then the later one
+        new_lows = np.minimum(np.maximum(lows[:-shift], lows[shift:]),
+            highs[shift:])
+        new_highs = np.minimum(np.maximum(highs[:-shift], lows[shift:]),
+            highs[shift:])
+        lows[shift:] = new_lows
+        highs[shift:] = new_highs
+        shift *= 2
+    return np.minimum(np.maximum(start, lows), highs)
+
+
+def level_counts(first_levels, last_levels, nb_levels):
+    """Count how many times each level is inside [first, last] ranges.
+    return: numpy array, of int counts per level."""
+    diff = np.bincount(first_levels, minlength=nb_levels + 1)[:nb_levels + 1]\
+        - np.bincount(last_levels + 1, minlength=nb_levels + 1)[:nb_levels + 1]
+    return np.cumsum(diff)[:nb_levels]
+
+
+def backtest(prices, range_bot, range_top, increment_coef, amount,
+    benef_alloc, nb_buy_to_display=0, nb_sell_to_display=0, spread_bot=None,
+    fees_coef=Decimal('0.9975'), fixed_point=None):
+    """Simulate the grid strategy over a price series.
+    The strategy keep buys under a gap level and sells above it. When the
+    price reach sells they are filled and the gap move up, buys are placed
+    under it with the set_several_buy amounts, and the other way around.
+    The display limits are not simulated: steps where more orders than
+    displayed would have been filled are counted in window_overruns.
+    prices: numpy array, of float prices, one per step.
+    range_bot, range_top, increment_coef, amount: Decimal, LW parameters.
+    benef_alloc: int, percentage of the benefice allocated to ALT.
+    nb_buy_to_display, nb_sell_to_display: int, optional, 0 means all.
+    spread_bot: Decimal, optional, highest buy price at start. The closest
+        level under the first price by default.
+    fees_coef: Decimal, optional, 1 - fees rate.
+    fixed_point: FixedPoint object, optional, precision of the prices of the
+        market, 8 decimals by default like LW.
+    return: BacktestResult."""
+    grid = Grid.from_range(Decimal(range_bot), Decimal(range_top),
+        Decimal(increment_coef), fixed_point or FixedPoint())
+    levels = np.array([float(price) for price in grid])
+    nb_levels = len(levels)
+    prices = np.asarray(prices, dtype=np.float64)
+    if spread_bot is not None:
+        spread_index = grid.index(Decimal(spread_bot))
+    else:
+        spread_index = int(np.searchsorted(levels, prices[0], 'right')) - 1
+    spread_index = min(max(spread_index, 0), nb_levels - 2)
+    # The gap can only move to the highest level under the price or to the
+    # lowest level above it. At start it is between spread_bot and spread_top
+    floors = np.searchsorted(levels, prices, 'right') - 1
+    ceils = np.minimum(np.searchsorted(levels, prices, 'left'), nb_levels - 1)
+    floors = np.maximum(floors, 0)
+    start = spread_index + 0.5
+    gaps = clamp_scan(np.minimum(floors, ceils), ceils, start)
+    previous_gaps = np.concatenate(([start], gaps[:-1]))
+    # Sells filled at levels ]previous gap, gap], buys at [gap, previous gap[
+    up = gaps > previous_gaps
+    down = gaps < previous_gaps
+    sell_first = np.floor(previous_gaps[up]).astype(np.int64) + 1
+    sell_last = gaps[up].astype(np.int64)
+    buy_first = gaps[down].astype(np.int64)
+    buy_last = np.ceil(previous_gaps[down]).astype(np.int64) - 1
+    sells = level_counts(sell_first, sell_last, nb_levels)
+    buys = level_counts(buy_first, buy_last, nb_levels)
+    # Amounts per level, the highest level has no sell above to rebuy from
+    fees = float(fees_coef)
+    amount = float(amount)
+    buy_amounts = np.full(nb_levels, amount * fees)
+    buy_amounts[:-1] = rebuy_amount(levels[:-1], levels[1:], amount, fees,
+        float(benef_alloc))
+    sell_quote = amount * levels * fees
+    buy_base = buy_amounts * fees
+    # Inventory along the series from the per level prefix sums
+    base_cumsum = np.concatenate(([0.0], np.cumsum(buy_base)))
+    step_base = np.zeros(len(prices))
+    step_base[up] = -amount * (sell_last - sell_first + 1)
+    step_base[down] = base_cumsum[buy_last + 1] - base_cumsum[buy_first]
+    inventory = np.cumsum(step_base)
+    base_delta = float(buys @ buy_base - sells.sum() * amount)
+    quote_delta = float(sells @ sell_quote - buys @ (buy_amounts * levels))
+    overruns = 0
+    if nb_sell_to_display:
+        overruns += int(np.count_nonzero(
+            sell_last - sell_first + 1 > nb_sell_to_display))
+    if nb_buy_to_display:
+        overruns += int(np.count_nonzero(
+            buy_last - buy_first + 1 > nb_buy_to_display))
+    return BacktestResult(
+        pnl=quote_delta + base_delta * float(prices[-1]),
+        base_delta=base_delta,
+        quote_delta=quote_delta,
+        min_base=float(min(inventory.min(), 0.0)),
+        max_base=float(max(inventory.max(), 0.0)),
+        fees_base=float(buys @ (buy_amounts * (1 - fees))),
+        fees_quote=float(sells @ (amount * levels * (1 - fees))),
+        nb_buys=int(buys.sum()),
+        nb_sells=int(sells.sum()),
+        window_overruns=overruns,
+        nb_levels=nb_levels,
+        last_price=float(prices[-1]))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Backtest LW parameters over a price series.')
+    parser.add_argument('prices', help="file with one 'price' or "
+        "'timestamp,price' per line")
+    parser.add_argument('--range-bot', required=True)
+    parser.add_argument('--range-top', required=True)
+    parser.add_argument('--increment-coef', required=True)
+    parser.add_argument('--amount', required=True)
+    parser.add_argument('--benef-alloc', type=int, default=0)
+    parser.add_argument('--nb-buy-to-display', type=int, default=0)
+    parser.add_argument('--nb-sell-to-display', type=int, default=0)
+    args = parser.parse_args()
+    result = backtest(load_price_series(args.prices), args.range_bot,
+        args.range_top, args.increment_coef, args.amount, args.benef_alloc,
+        args.nb_buy_to_display, args.nb_sell_to_display)
+    print(json.dumps(result._asdict()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+# Benchmarks of the strategy hot paths, exchange calls are stubbed
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+from decimal import Decimal
+from time import perf_counter
+
+from LazyStarter import LazyStarter
+from fillDetector import FillDetector
+from order import Order
+from orderLedger import OrderLedger
+from rateLimiter import TokenBucket, ApiRequester
+from stateStore import StateStore
+from tradeHistory import TradeHistory
+import zebitexFormatted
+
+SIZES = [10, 100, 500, 2000]
+MARKET = 'ETH/BTC'
+RANGE_BOT = Decimal('0.01')
+INCREMENT = Decimal('1.001')
+# Run by a fresh interpreter, print the seconds spent to import LazyStarter
+# and to create a LazyStarter, then if ccxt have been imported
+STARTUP_SCRIPT = '''
+import sys
+from time import perf_counter
+start = perf_counter()
+import LazyStarter
+imported = perf_counter()
+LazyStarter.LazyStarter()
+print(imported - start, perf_counter() - imported, 'ccxt' in sys.modules)
+'''
+
+
+class StubExchange:
+    """Marketplace answering instantly with canned payloads."""
+
+    def __init__(self, open_orders, price):
+        self.open_orders = open_orders
+        self.price = price
+        self.next_id = 0
+        self.rateLimit = 0
+        self.symbols = [MARKET]
+
+    def fetch_open_orders(self, market=None):
+        return self.open_orders
+
+    def fetch_balance(self):
+        return {'ETH': {'free': '1000000', 'used': '0', 'total': '1000000'},
+                'BTC': {'free': '1000000', 'used': '0', 'total': '1000000'}}
+
+    def fetch_ticker(self, market):
+        return {'symbol': market, 'last': float(self.price)}
+
+    def fetch_trades(self, market, since=None):
+        return []
+
+    def fetch_my_trades(self, market=None, since=None, limit=None):
+        return []
+
+    def create_limit_buy_order(self, market, amount, price):
+        self.next_id += 1
+        return {'id': str(self.next_id)}
+
+    def create_limit_sell_order(self, market, amount, price):
+        self.next_id += 1
+        return {'id': str(self.next_id)}
+
+    def cancel_order(self, order_id):
+        return True
+
+
+class StubZebitex:
+    """Zebitex API answering with canned open orders."""
+
+    def __init__(self, items):
+        self.items = items
+
+    def open_orders(self, page=1, per=10):
+        return {'items': self.items[(page - 1) * per:page * per],
+                'page': page, 'per': per, 'total': len(self.items)}
+
+
+class BenchLazyStarter(LazyStarter):
+    """LazyStarter without keys file, connected to a StubExchange."""
+
+    def keys_initialisation(self):
+        self.user_market_name_list = ['fake']
+        return {'fake': {}}
+
+
+def ccxt_order(i, side, price, timestamp=1546300800000):
+    return {'id': str(i), 'side': side, 'price': float(price),
+            'amount': 1.0, 'timestamp': timestamp + i,
+            'datetime': '2019-01-01T00:00:00.000Z', 'symbol': MARKET}
+
+
+def zebitex_order(i, side, price):
+    return {'id': i, 'ordType': 'limit', 'price': str(price),
+            'amount': '1.00000000', 'filled': '0.00000000',
+            'total': str(price), 'updatedAt': '2019-01-01 00:00:00',
+            'state': 'pending', 'side': side, 'pair': MARKET}
+
+
+def build_bot(size):
+    """Bot with a grid of size levels and an order on each level, buys under
+    the middle of the grid and sells above.
+    return: LazyStarter object."""
+    bot = BenchLazyStarter()
+    intervals = bot.interval_generator(RANGE_BOT,
+        RANGE_BOT * INCREMENT ** size + Decimal('0.00000001'), INCREMENT)
+    bot.intervals = intervals.with_safety_levels(bot.safety_buy_value,
+        bot.safety_sell_value, bot.price_fp)
+    bot.max_sell_index = bot.intervals.highest_level_index
+    middle = len(bot.intervals) // 2
+    bot.params = {'range_bot': bot.intervals[1],
+                  'range_top': bot.intervals[-2],
+                  'spread_bot': bot.intervals[middle - 1],
+                  'spread_top': bot.intervals[middle],
+                  'increment_coef': INCREMENT,
+                  'amount': Decimal('1'),
+                  'stop_at_bot': False,
+                  'stop_at_top': False,
+                  'nb_buy_to_display': middle - 1,
+                  'nb_sell_to_display': bot.max_sell_index - middle,
+                  'benef_alloc': 50}
+    bot.selected_market = MARKET
+    raw_orders = [ccxt_order(i, 'buy', bot.intervals[i])
+                  for i in range(1, middle)]
+    raw_orders += [ccxt_order(i, 'sell', bot.intervals[i])
+                   for i in range(middle + 1, bot.max_sell_index + 1)]
+    bot.exchange = StubExchange(raw_orders, bot.intervals[middle])
+    bot.api = ApiRequester(TokenBucket(None), bot.applog)
+    bot.max_orders_in_flight = 1
+    return bot
+
+
+def bench_cases(size):
+    """Build the benchmarked functions for a grid size.
+    return: list, of (name, setup, func). setup return the arguments of func,
+        it is not timed."""
+    bot = build_bot(size)
+    raw_orders = bot.exchange.open_orders
+    orders = Order.from_ccxt_list(raw_orders)
+    reversed_orders = {side: list(reversed(value))
+                       for side, value in orders.items()}
+    # A few orders outside of the strategy
+    off_strat = {'buy': orders['buy'] + [bot.format_order('x', '0.00999',
+                     1, 0, '')],
+                 'sell': orders['sell'] + [bot.format_order('y', '1.5', 1,
+                     0, '')]}
+    zebitex = zebitexFormatted.ZebitexFormatted()
+    zebitex.ze = StubZebitex([zebitex_order(order['id'], order['side'],
+        Decimal(str(order['price']))) for order in raw_orders])
+    zebitex_item = zebitex.ze.items[0]
+    lean_zebitex = zebitexFormatted.ZebitexFormatted(lean=True)
+    lean_zebitex.ze = zebitex.ze
+    # Trade history of the grid, already recorded in the store, the poll of
+    # the fill detector find nothing new
+    history_bot = build_bot(size)
+    history_bot.fill_detector = FillDetector(history_bot.fetch_my_trades,
+        MARKET, 0)
+    history_bot.trade_history = TradeHistory(StateStore(':memory:'), MARKET)
+    history_bot.trade_history.store.save_trades(MARKET,
+        orders['buy'] + orders['sell'])
+
+    def set_ledger():
+        bot.open_orders = OrderLedger(orders)
+
+    def compare_setup():
+        # The highest buy has been filled
+        set_ledger()
+        new_orders = {'buy': orders['buy'][:-1], 'sell': list(orders['sell'])}
+        return new_orders, {'buy': [], 'sell': []}
+
+    def limit_setup():
+        # Too many orders on the book for the display parameters
+        set_ledger()
+        bot.params['nb_buy_to_display'] = max(len(orders['buy']) - 2, 1)
+        bot.params['nb_sell_to_display'] = max(len(orders['sell']) - 2, 1)
+        return ()
+
+    def funds_setup():
+        return (dict(bot.params),)
+
+    return [
+        ('format_order', lambda: (), lambda: [bot.format_order(order['id'],
+            order['price'], order['amount'], order['timestamp'],
+            order['datetime']) for order in raw_orders]),
+        ('from_ccxt_list', lambda: (raw_orders,), Order.from_ccxt_list),
+        ('get_orders', lambda: (MARKET,), bot.get_orders),
+        ('orders_price_ordering', lambda: ({side: list(value) for side, value
+            in reversed_orders.items()},), bot.orders_price_ordering),
+        ('remove_orders_off_strat', lambda: ({side: list(value) for side,
+            value in off_strat.items()},), bot.remove_orders_off_strat),
+        ('compare_orders', compare_setup, bot.compare_orders),
+        ('limit_nb_orders', limit_setup, bot.limit_nb_orders),
+        ('check_for_enough_funds', funds_setup, bot.check_for_enough_funds),
+        ('interval_generator', lambda: (RANGE_BOT, RANGE_BOT * INCREMENT **
+            size + Decimal('0.00000001'), INCREMENT), bot.interval_generator),
+        ('get_user_history', lambda: (MARKET,),
+            history_bot.get_user_history),
+        ('ZebitexFormatted.order_formatted', lambda: (), lambda:
+            [zebitex.order_formatted(zebitex_item) for i in range(size)]),
+        ('ZebitexFormatted.fetch_open_orders', lambda: (MARKET,),
+            zebitex.fetch_open_orders),
+        ('ZebitexFormatted.fetch_open_orders_lean', lambda: (MARKET,),
+            lean_zebitex.fetch_open_orders),
+    ]
+
+
+def measure(setup, func, repeat, min_time):
+    """Time func, called with the setup result, at least repeat times and
+    for at least min_time seconds.
+    return: dict, timings in microseconds."""
+    timings = []
+    total = 0
+    while len(timings) < repeat or total < min_time:
+        args = setup()
+        start = perf_counter()
+        func(*args)
+        elapsed = perf_counter() - start
+        timings.append(elapsed)
+        total += elapsed
+    return summary(timings)
+
+
+def summary(timings):
+    """timings: list, of seconds.
+    return: dict, timings in microseconds."""
+    return {'min_us': min(timings) * 1e6,
+            'median_us': statistics.median(timings) * 1e6,
+            'runs': len(timings)}
+
+
+def measure_startup(runs):
+    """Time the import of LazyStarter and the creation of a LazyStarter in
+    fresh interpreters, from a directory whose keys.txt only hold the fake
+    marketplace.
+    runs: int, number of interpreters started.
+    return: dict, results by name."""
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    python_path = [script_dir] + [path for path in
+        os.environ.get('PYTHONPATH', '').split(os.pathsep) if path]
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(python_path))
+    import_timings, init_timings = [], []
+    ccxt_imported = False
+    with tempfile.TemporaryDirectory() as work_dir:
+        with open(os.path.join(work_dir, 'keys.txt'), mode='w',
+            encoding='utf-8') as keys_file:
+            keys_file.write("{'fake': {}}\n")
+        for i in range(runs):
+            output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT],
+                cwd=work_dir, env=env, capture_output=True, text=True,
+                check=True).stdout.split()
+            import_timings.append(float(output[0]))
+            init_timings.append(float(output[1]))
+            ccxt_imported = ccxt_imported or output[2] == 'True'
+    if ccxt_imported:
+        print('WARNING ccxt is imported at startup')
+    return {'startup_import': summary(import_timings),
+            'startup_init': summary(init_timings)}
+
+
+def run(sizes, repeat, min_time, selected=None):
+    """Run every benchmark at every size.
+    return: dict, results by 'name[size]'."""
+    results = {}
+    logging.disable(logging.CRITICAL)
+    try:
+        for size in sizes:
+            for name, setup, func in bench_cases(size):
+                if selected and name not in selected:
+                    continue
+                results[f'{name}[{size}]'] = measure(setup, func, repeat,
+                    min_time)
+    finally:
+        logging.disable(logging.NOTSET)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Compare the median timings with a baseline.
+    threshold: float, ratio from where a slow down is a regression.
+    return: list, of (name, baseline us, result us, ratio) regressions."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result['median_us'] / baseline[name]['median_us']
+        if ratio > threshold:
+            regressions.append((name, baseline[name]['median_us'],
+                result['median_us'], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Benchmark the strategy hot paths.')
+    parser.add_argument('--sizes', default=','.join(str(size) for size
+        in SIZES), help='grid sizes, comma separated')
+    parser.add_argument('--only', help='benchmark names, comma separated')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--min-time', type=float, default=0.2,
+        help='minimum seconds spent per benchmark')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', help='results file to compare with')
+    parser.add_argument('--threshold', type=float, default=1.25,
+        help='median slow down ratio flagged as a regression')
+    parser.add_argument('--startup-runs', type=int, default=5,
+        help='interpreters started to time the startup, 0 to skip it')
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(',')]
+    selected = args.only.split(',') if args.only else None
+    results = run(sizes, args.repeat, args.min_time, selected)
+    if args.startup_runs > 0 and (not selected or 'startup' in selected):
+        results.update(measure_startup(args.startup_runs))
+    with open(args.output, mode='w', encoding='utf-8') as output:
+        json.dump({'python': platform.python_version(),
+                   'results': results}, output, indent=2)
+    for name, result in results.items():
+        print(f"{name:50} {result['median_us']:14.1f} us")
+    if args.baseline:
+        with open(args.baseline, mode='r', encoding='utf-8') as baseline:
+            regressions = compare(results, json.load(baseline)['results'],
+                args.threshold)
+        for name, before, after, ratio in regressions:
+            print(f'REGRESSION {name}: {before:.1f} us -> {after:.1f} us '
+                  f'(x{ratio:.2f})')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
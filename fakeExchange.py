@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+# In memory marketplace with the same interface as ZebitexFormatted
+import threading
+from decimal import Decimal
+from timestamps import now_ms, ms_to_iso
+
+
+class FakeExchangeError(Exception):
+    """Invalid orders, unknown orders and lack of funds."""
+
+
+class EndOfPricePath(Exception):
+    """Raised by sleep() when the whole price path have been played."""
+
+
+class FakeExchange():
+    """Deterministic marketplace used for profiling and regression tests.
+    The market follows a scripted price path, one price each tick seconds.
+    Resting orders are matched at each new price with a price-time priority:
+    buys at or above the price and sells at or below the price are filled.
+    The clock only moves when sleep() is called, so a strategy loop run as
+    fast as the CPU allows."""
+
+    def __init__(self, apiKey=None, secret=None, price_path=None, tick=1,
+        balance=None, symbols=None, start=None, fees='0.0015'):
+        """apiKey, secret: ignored, accepted to be built from keys.txt.
+        price_path: list of prices, list of (timestamp in ms, price) or a
+            file name with one 'price' or 'timestamp,price' per line.
+        tick: float, optional, seconds between two prices without timestamp.
+        balance: dict, optional, free balance per currency.
+        symbols: list, optional, market names.
+        start: int, optional, timestamp in ms of the first price, by default
+            the first timestamp of the path or now.
+        fees: string, optional, fees rate applied to each trade."""
+        self.fees = Decimal(fees)
+        self.rateLimit = 0
+        self.symbols = symbols if symbols else ['ETH/BTC']
+        self.markets = {}
+        self.clock = int(start) if start is not None else now_ms()
+        self.price_path = self.load_price_path(price_path, tick) \
+            if price_path else [(self.clock, Decimal('0.001'))]
+        if start is None:
+            # A timestamped path is played from its beginning
+            self.clock = self.price_path[0][0]
+        self.path_position = 0
+        self.last_price = self.price_path[0][1]
+        self.balance = {}
+        for currency, free in (balance if balance else
+            {'BTC': '10', 'ETH': '10000'}).items():
+            self.balance[currency] = {'free': Decimal(str(free)),
+                                      'used': Decimal('0')}
+        self.orders = {}
+        self.book = {'buy': [], 'sell': []}
+        self.trades = []
+        self.next_id = 1
+        self.lock = threading.RLock()
+        self.move_to(self.clock)
+
+    def load_price_path(self, price_path, tick):
+        """Read the price path and give a timestamp to each price.
+        return: list, of (timestamp, Decimal price)."""
+        if isinstance(price_path, str):
+            with open(price_path, mode='r', encoding='utf-8') as path_file:
+                price_path = [line.strip().split(',') for line in path_file
+                    if line.strip()]
+                price_path = [item[0] if len(item) == 1 else item
+                    for item in price_path]
+        timed_path = []
+        for i, item in enumerate(price_path):
+            if isinstance(item, (list, tuple)):
+                timed_path.append((int(item[0]), Decimal(str(item[1]))))
+            else:
+                timed_path.append((self.clock + int(i * tick * 1000),
+                    Decimal(str(item))))
+        return timed_path
+
+    #
+    # Simulation
+    #
+
+    def sleep(self, seconds):
+        """Move the clock forward and play the prices of the path.
+        seconds: float."""
+        if self.path_position >= len(self.price_path):
+            raise EndOfPricePath(f'End of the price path at {self.clock}')
+        self.move_to(self.clock + int(seconds * 1000))
+
+    def move_to(self, timestamp):
+        with self.lock:
+            while self.path_position < len(self.price_path) and\
+                self.price_path[self.path_position][0] <= timestamp:
+                self.clock, price = self.price_path[self.path_position]
+                self.path_position += 1
+                self.set_price(price)
+            self.clock = max(self.clock, timestamp)
+
+    def set_price(self, price):
+        """Fill the orders crossed by a new market price."""
+        self.last_price = price
+        for order in list(self.book['buy']):
+            if order['price'] < price:
+                break
+            self.fill(order, order['price'])
+        for order in list(self.book['sell']):
+            if order['price'] > price:
+                break
+            self.fill(order, order['price'])
+
+    def fill(self, order, price):
+        """Fully execute an order and update the balances."""
+        base, quote = order['symbol'].split('/')
+        amount = order['amount']
+        if order['side'] == 'buy':
+            self.balance[quote]['used'] -= order['price'] * amount
+            self.balance[quote]['free'] += (order['price'] - price) * amount
+            self.credit(base, amount * (1 - self.fees))
+            fee = {'cost': amount * self.fees, 'currency': base}
+        else:
+            self.balance[base]['used'] -= amount
+            self.credit(quote, price * amount * (1 - self.fees))
+            fee = {'cost': price * amount * self.fees, 'currency': quote}
+        order['filled'] = amount
+        order['status'] = 'closed'
+        self.book[order['side']].remove(order)
+        self.trades.append({'id': str(len(self.trades) + 1),
+                            'order': order['id'],
+                            'symbol': order['symbol'],
+                            'side': order['side'],
+                            'price': price,
+                            'amount': amount,
+                            'timestamp': self.clock,
+                            'fee': fee})
+
+    def credit(self, currency, amount):
+        self.balance.setdefault(currency, {'free': Decimal('0'),
+                                           'used': Decimal('0')})
+        self.balance[currency]['free'] += amount
+
+    def lock_funds(self, currency, amount):
+        if currency not in self.balance or\
+            self.balance[currency]['free'] < amount:
+            raise FakeExchangeError(f'Not enough {currency} to lock {amount}')
+        self.balance[currency]['free'] -= amount
+        self.balance[currency]['used'] += amount
+
+    def milliseconds(self):
+        """return: int, the simulated clock, ccxt like."""
+        return self.clock
+
+    def datetime(self, timestamp):
+        return ms_to_iso(timestamp)
+
+    #
+    # ccxt like interface
+    #
+
+    def load_markets(self):
+        self.markets = {market['symbol']: market
+                        for market in self.fetch_markets()}
+        return self.markets
+
+    def fetch_markets(self):
+        return [{'symbol': symbol,
+                 'precision': {'amount': 8, 'price': 8},
+                 'maker': float(self.fees),
+                 'taker': float(self.fees)}
+                for symbol in self.symbols]
+
+    def fetch_balance(self):
+        with self.lock:
+            return {currency: {'free': str(value['free']),
+                               'used': str(value['used']),
+                               'total': str(value['free'] + value['used'])}
+                    for currency, value in self.balance.items()}
+
+    def fetch_ticker(self, symbol):
+        return {'symbol': symbol,
+                'timestamp': self.clock,
+                'datetime': self.datetime(self.clock),
+                'bid': float(self.last_price),
+                'ask': float(self.last_price),
+                'last': float(self.last_price)}
+
+    def fetch_open_orders(self, symbol=None):
+        with self.lock:
+            return [self.order_formatted(order)
+                    for side in ('buy', 'sell') for order in self.book[side]
+                    if not symbol or order['symbol'] == symbol]
+
+    def fetch_my_trades(self, symbol=None, since=None, limit=None):
+        with self.lock:
+            trades = [self.trade_formatted(trade) for trade in self.trades
+                      if (not symbol or trade['symbol'] == symbol)
+                      and (not since or trade['timestamp'] >= since)]
+        return trades[:limit] if limit else trades
+
+    def fetch_trades(self, symbol, since=None):
+        """Like ZebitexFormatted, return the user trades."""
+        return self.fetch_my_trades(symbol, since)
+
+    def create_limit_buy_order(self, symbol, amount, price):
+        return self.create_order(symbol, 'buy', amount, price)
+
+    def create_limit_sell_order(self, symbol, amount, price):
+        return self.create_order(symbol, 'sell', amount, price)
+
+    def create_order(self, symbol, side, amount, price):
+        amount = Decimal(str(amount))
+        price = Decimal(str(price))
+        if symbol not in self.symbols or amount <= 0 or price <= 0:
+            raise FakeExchangeError(
+                f'Invalid order {side} {amount} {symbol} at {price}')
+        base, quote = symbol.split('/')
+        with self.lock:
+            if side == 'buy':
+                self.lock_funds(quote, price * amount)
+            else:
+                self.lock_funds(base, amount)
+            order = {'id': str(self.next_id), 'symbol': symbol, 'side': side,
+                     'price': price, 'amount': amount, 'filled': Decimal('0'),
+                     'timestamp': self.clock, 'status': 'open'}
+            self.next_id += 1
+            self.orders[order['id']] = order
+            # Price-time priority: best price first, then the oldest
+            book = self.book[side]
+            i = 0
+            if side == 'buy':
+                while i < len(book) and book[i]['price'] >= price:
+                    i += 1
+            else:
+                while i < len(book) and book[i]['price'] <= price:
+                    i += 1
+            book.insert(i, order)
+            # An order crossing the market is executed at the market price
+            if (side == 'buy' and price >= self.last_price) or\
+                (side == 'sell' and price <= self.last_price):
+                self.fill(order, self.last_price)
+            return self.order_formatted(order)
+
+    def cancel_order(self, order_id):
+        with self.lock:
+            order = self.orders.get(str(order_id))
+            if not order or order['status'] != 'open':
+                raise FakeExchangeError(f'Order {order_id} is not open')
+            base, quote = order['symbol'].split('/')
+            if order['side'] == 'buy':
+                self.balance[quote]['used'] -= order['price'] * order['amount']
+                self.balance[quote]['free'] += order['price'] * order['amount']
+            else:
+                self.balance[base]['used'] -= order['amount']
+                self.balance[base]['free'] += order['amount']
+            order['status'] = 'canceled'
+            self.book[order['side']].remove(order)
+            return True
+
+    def order_formatted(self, order):
+        return {'id': order['id'],
+                'timestamp': order['timestamp'],
+                'datetime': self.datetime(order['timestamp']),
+                'status': order['status'],
+                'symbol': order['symbol'],
+                'type': 'limit',
+                'side': order['side'],
+                'price': float(order['price']),
+                'amount': float(order['amount']),
+                'filled': float(order['filled']),
+                'remaining': float(order['amount'] - order['filled'])}
+
+    def trade_formatted(self, trade):
+        return {'id': trade['id'],
+                'order': trade['order'],
+                'timestamp': trade['timestamp'],
+                'datetime': self.datetime(trade['timestamp']),
+                'symbol': trade['symbol'],
+                'type': 'limit',
+                'side': trade['side'],
+                'price': float(trade['price']),
+                'amount': float(trade['amount']),
+                'cost': float(trade['price'] * trade['amount']),
+                'fee': {'cost': float(trade['fee']['cost']),
+                        'currency': trade['fee']['currency']}}
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+# Detection of the executed orders from the user trade history
+from collections import Counter, namedtuple
+from decimal import Decimal
+
+# occurrence is the number of the trade among the identical ones of its
+# timestamp, from 1
+Fill = namedtuple('Fill', ['side', 'price', 'amount', 'timestamp', 'order_id',
+                           'occurrence'], defaults=(1,))
+
+
+class FillDetector:
+    """Keep a cursor on the user trade history of a market and only read the
+    trades done after it.
+    The cursor is the timestamp of the last seen trade. Trades sharing this
+    timestamp are counted to not report them twice, as the history is asked
+    again from the cursor included. Zebitex trades have no id and are dated
+    to the second, identical partial fills are told apart by their count."""
+
+    def __init__(self, fetch_my_trades, market, since):
+        """fetch_my_trades: function, called with the market and a timestamp,
+            return a list of trades formatted like ccxt.
+        market: string, market name.
+        since: int, timestamp in ms from where fills are detected."""
+        self.fetch_my_trades = fetch_my_trades
+        self.market = market
+        self.cursor = since
+        self.seen_at_cursor = Counter()
+
+    def trade_key(self, trade):
+        """return: tuple, identify a trade even without id."""
+        return (trade['id'], trade['order'], trade['side'], trade['price'],
+                trade['amount'], trade['timestamp'])
+
+    def poll(self):
+        """Read the trades done since the last call.
+        return: list, of Fill ordered by timestamp."""
+        trades = self.fetch_my_trades(self.market, self.cursor)
+        fills = []
+        occurrences = Counter()
+        for trade in sorted(trades, key=lambda trade: trade['timestamp']):
+            if trade['timestamp'] < self.cursor:
+                continue
+            key = self.trade_key(trade)
+            occurrences[key] += 1
+            if trade['timestamp'] == self.cursor\
+                and occurrences[key] <= self.seen_at_cursor[key]:
+                continue
+            if trade['timestamp'] > self.cursor:
+                self.cursor = trade['timestamp']
+                self.seen_at_cursor = Counter()
+            self.seen_at_cursor[key] = occurrences[key]
+            fills.append(Fill(trade['side'], Decimal(str(trade['price'])),
+                Decimal(str(trade['amount'])), trade['timestamp'],
+                trade['order'], occurrences[key]))
+        return fills
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# Fixed-point arithmetic on integers scaled to the precision of a market
+from decimal import Decimal
+from functools import lru_cache
+
+
+def round_half_even(numerator, denominator):
+    """Integer division rounded like ROUND_HALF_EVEN.
+    numerator: int.
+    denominator: int, > 0.
+    return: int."""
+    quotient, remainder = divmod(numerator, denominator)
+    double = remainder * 2
+    if double > denominator or (double == denominator and quotient & 1):
+        quotient += 1
+    return quotient
+
+
+@lru_cache(maxsize=8192, typed=True)
+def ratio(nb):
+    """Exact fraction of a number, the grid prices and parameters come back
+    every cycle so they are cached.
+    nb: Decimal, int, float or string, floats are read from their str().
+    return: tuple, (numerator, denominator)."""
+    if not isinstance(nb, Decimal):
+        nb = Decimal(str(nb))
+    return nb.as_integer_ratio()
+
+
+class FixedPoint:
+    """Numbers stored as integers in units of 10 ** -places, with 8 places a
+    unit is a satoshi. Products are computed exactly and rounded once, like
+    Decimal.quantize() with ROUND_HALF_EVEN, whatever the decimal context
+    is. Decimal is only used to convert the values coming from or sent to
+    the marketplace."""
+
+    def __init__(self, places=8):
+        """places: int, optional, number of decimals."""
+        self.places = places
+        self.scale = 10 ** places
+        self.unit = Decimal(1).scaleb(-places)
+
+    @classmethod
+    def from_precision(cls, precision, default=8):
+        """Build it from the precision of a market loaded by ccxt, which is
+        a number of decimals or a tick size depending on the marketplace.
+        precision: int, float or None.
+        default: int, optional, places used when precision is None.
+        return: FixedPoint object."""
+        if precision is None:
+            return cls(default)
+        if precision >= 1:
+            return cls(int(precision))
+        exponent = Decimal(str(precision)).normalize().as_tuple().exponent
+        return cls(max(-exponent, 0))
+
+    def units(self, *numbers):
+        """Units of the product of numbers.
+        numbers: Decimal, int, float or string.
+        return: int."""
+        numerator, denominator = self.scale, 1
+        for nb in numbers:
+            nb_numerator, nb_denominator = ratio(nb)
+            numerator *= nb_numerator
+            denominator *= nb_denominator
+        return round_half_even(numerator, denominator)
+
+    def mul(self, units, *factors):
+        """Product of a value already in units by factors.
+        units: int.
+        factors: Decimal, int, float or string.
+        return: int."""
+        numerator, denominator = units, 1
+        for factor in factors:
+            factor_numerator, factor_denominator = ratio(factor)
+            numerator *= factor_numerator
+            denominator *= factor_denominator
+        return round_half_even(numerator, denominator)
+
+    def mul_each(self, units, *factors):
+        """mul() of every value of a list by the same factors.
+        units: list, of int.
+        factors: Decimal, int, float or string.
+        return: list, of int."""
+        numerator, denominator = 1, 1
+        for factor in factors:
+            factor_numerator, factor_denominator = ratio(factor)
+            numerator *= factor_numerator
+            denominator *= factor_denominator
+        return [round_half_even(value * numerator, denominator)
+                for value in units]
+
+    def to_decimal(self, units):
+        """units: int.
+        return: Decimal, with exactly places decimals."""
+        return Decimal(units) * self.unit
+
+    def quantize(self, nb):
+        """return: Decimal, nb rounded to places decimals."""
+        return self.to_decimal(self.units(nb))
+
+    def multiplier(self, *numbers):
+        """return: Decimal, the rounded product of numbers."""
+        return self.to_decimal(self.units(*numbers))
+
+    def __repr__(self):
+        return f'FixedPoint({self.places})'
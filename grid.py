@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+# Price levels of the strategy
+from bisect import bisect_left
+
+from fixedPoint import ratio, round_half_even
+
+
+class Grid:
+    """Price levels used by the strategy, from the lowest to the highest.
+    It behave like the list of prices it replace but index() and the in
+    operator use a precomputed price to index map, so they don't depend on
+    the number of levels.
+    units keep the prices in units of the FixedPoint the grid was generated
+    with, for the sums done on the whole grid."""
+
+    def __init__(self, prices, has_safety_levels=False, units=None):
+        """prices: list, of Decimal, ordered from the lowest.
+        has_safety_levels: bool, optional, True when the first and last
+            prices are the safety orders values.
+        units: list, optional, of int, prices in units of a FixedPoint."""
+        self.prices = list(prices)
+        self.positions = {price: i for i, price in enumerate(self.prices)}
+        self.has_safety_levels = has_safety_levels
+        self.units = units
+
+    @classmethod
+    def from_range(cls, range_bottom, range_top, increment, fixed_point):
+        """Generate the levels inside a range by incrementing values. Levels
+        are computed in units of fixed_point and only converted to Decimal
+        at the end.
+        range_bottom: Decimal, bottom of the range
+        range_top: Decimal, top of the range
+        increment: Decimal, value used to increment from the bottom
+        fixed_point: FixedPoint object, precision of the prices, each level
+            is the previous one multiplied by increment and rounded.
+        return: Grid, value from [range_bottom, range_top[
+        """
+        increment_numerator, increment_denominator = ratio(increment)
+        top_numerator, top_denominator = ratio(range_top)
+        # level <= range_top without leaving the integers
+        top = top_numerator * fixed_point.scale
+        level = fixed_point.units(range_bottom)
+        intervals = [level]
+        level = round_half_even(level * increment_numerator,
+            increment_denominator)
+        if top <= level * top_denominator:
+            raise ValueError('Range top value is too low')
+        # round_half_even() inlined, it's called once per level
+        double_numerator = 2 * increment_numerator
+        double_denominator = 2 * increment_denominator
+        while level * top_denominator <= top:
+            intervals.append(level)
+            level, remainder = divmod(level * double_numerator
+                + increment_denominator, double_denominator)
+            if not remainder and level & 1:
+                level -= 1
+        if len(intervals) < 6:
+            msg = (
+                    f'Range top value is too low, or increment too '
+                    f'high: need to generate at lease 6 intervals. Try again!'
+                )
+            raise ValueError(msg)
+        return cls([fixed_point.to_decimal(level) for level in intervals],
+            units=intervals)
+
+    def with_safety_levels(self, safety_buy_value, safety_sell_value,
+        fixed_point=None):
+        """Add the funds locker values at both ends of the grid.
+        safety_buy_value: Decimal, price of the safety buy order.
+        safety_sell_value: Decimal, price of the safety sell order.
+        fixed_point: FixedPoint object, optional, the one of units.
+        return: Grid."""
+        units = None
+        if self.units is not None and fixed_point:
+            units = [fixed_point.units(safety_buy_value)] + self.units\
+                + [fixed_point.units(safety_sell_value)]
+        return Grid([safety_buy_value] + self.prices + [safety_sell_value],
+            True, units)
+
+    def level_units(self, fixed_point):
+        """return: list, of int, the prices in units of fixed_point."""
+        if self.units is None:
+            self.units = [fixed_point.units(price) for price in self.prices]
+        return self.units
+
+    @property
+    def lowest_level_index(self):
+        """Index of the lowest price used by the strategy orders."""
+        return 1 if self.has_safety_levels else 0
+
+    @property
+    def highest_level_index(self):
+        """Index of the highest price used by the strategy orders."""
+        return len(self.prices) - (2 if self.has_safety_levels else 1)
+
+    def index(self, price):
+        """return: int, position of a price in the grid."""
+        try:
+            return self.positions[price]
+        except KeyError:
+            raise ValueError(f'{price} is not in the grid')
+
+    def nearest_index(self, price):
+        """Position of the closest level of a price, which can be off grid.
+        price: Decimal.
+        return: int."""
+        position = bisect_left(self.prices, price)
+        if position == 0:
+            return 0
+        if position == len(self.prices):
+            return position - 1
+        if price - self.prices[position - 1] <= self.prices[position] - price:
+            return position - 1
+        return position
+
+    def __contains__(self, price):
+        return price in self.positions
+
+    def __getitem__(self, position):
+        return self.prices[position]
+
+    def __len__(self):
+        return len(self.prices)
+
+    def __iter__(self):
+        return iter(self.prices)
+
+    def __repr__(self):
+        return repr(self.prices)
+
+
+def rebuy_amount(price, next_price, amount, fees_coef, benef_alloc,
+    multiplier=None):
+    """Amount of ALT to buy at price once the sell at next_price is filled.
+    benef_alloc % of the benefice is used to buy more ALT. Work with Decimal
+    or with NumPy arrays of prices.
+    price: buy price.
+    next_price: price of the filled sell order.
+    amount: amount of ALT per order.
+    fees_coef: 1 - fees rate.
+    benef_alloc: percentage of the benefice allocated to ALT.
+    multiplier: function, optional, quantized product of three numbers.
+    return: amount to buy, not quantized."""
+    if multiplier is None:
+        multiplier = lambda nb1, nb2, nb3: nb1 * nb2 * nb3
+    btc_won = multiplier(next_price, amount, fees_coef)
+    btc_to_spend = multiplier(price, amount, fees_coef)
+    return ((btc_won - btc_to_spend) * benef_alloc / 100 + btc_to_spend)\
+        / price
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+# Logging through a bounded queue, the I/O is done by a background thread
+import copy
+import logging
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from structLog import LazyEvent
+
+
+class OverflowQueueHandler(QueueHandler):
+    """Put the records in a bounded queue read by a QueueListener.
+    When the queue is full, records under block_level are dropped and
+    counted, the others wait for some room: order events logged as warnings
+    are never lost. The number of dropped records is logged as soon as there
+    is room again."""
+
+    def __init__(self, log_queue, block_level=logging.WARNING):
+        """log_queue: queue.Queue object, bounded.
+        block_level: int, optional, lowest level of the records which are
+            never dropped."""
+        super().__init__(log_queue)
+        self.block_level = block_level
+        self.dropped = 0
+        self.drop_lock = threading.Lock()
+        # Set by start_queue_logging
+        self.listener = None
+
+    def prepare(self, record):
+        """Freeze the message of a record without formatting it, it is
+        formatted by the handlers of the listener thread.
+        The payload of a LazyEvent is copied, it holds the ledger and order
+        lists the strategy keep changing, and rendered by the listener. The
+        other messages are only merged with their arguments."""
+        record = copy.copy(record)
+        if isinstance(record.msg, LazyEvent):
+            record.msg = record.msg.snapshot()
+        else:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record):
+        block = record.levelno >= self.block_level
+        try:
+            self.queue.put(record, block)
+        except queue.Full:
+            with self.drop_lock:
+                self.dropped += 1
+            return
+        if self.dropped:
+            self.report_dropped(record.name, block)
+
+    def report_dropped(self, name, block):
+        with self.drop_lock:
+            dropped, self.dropped = self.dropped, 0
+        try:
+            self.queue.put(logging.makeLogRecord({
+                'name': name,
+                'levelno': logging.WARNING,
+                'levelname': 'WARNING',
+                'msg': f'{dropped} log records dropped, the queue was full'}),
+                block)
+        except queue.Full:
+            with self.drop_lock:
+                self.dropped += dropped
+
+
+class DrainingQueueListener(QueueListener):
+    """QueueListener which wait for room in a full queue to stop, instead
+    of failing. Stopping it twice does nothing, and close its handlers."""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+    def stop(self):
+        if self._thread is None:
+            return
+        super().stop()
+        for handler in self.handlers:
+            handler.close()
+
+
+def stop_queue_logging(logger):
+    """Remove the queue handlers of a logger and stop their listener, so a
+    logger set up again doesn't write its records twice.
+    logger: logging object."""
+    for handler in list(logger.handlers):
+        if isinstance(handler, OverflowQueueHandler):
+            logger.removeHandler(handler)
+            if handler.listener:
+                handler.listener.stop()
+
+
+def start_queue_logging(logger, handlers, maxsize=10000,
+    block_level=logging.WARNING):
+    """Make a logger send its records to handlers through a bounded queue
+    and a listener thread.
+    logger: logging object.
+    handlers: list, of handlers, their level is respected.
+    maxsize: int, optional, size of the queue.
+    block_level: int, optional, see OverflowQueueHandler.
+    return: QueueListener object, already started."""
+    stop_queue_logging(logger)
+    log_queue = queue.Queue(maxsize)
+    queue_handler = OverflowQueueHandler(log_queue, block_level)
+    queue_handler.setLevel(min(handler.level for handler in handlers))
+    logger.addHandler(queue_handler)
+    listener = DrainingQueueListener(log_queue, *handlers,
+        respect_handler_level=True)
+    queue_handler.listener = listener
+    listener.start()
+    return listener
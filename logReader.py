@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# Read the end of the log files without loading them
+import json
+import os
+
+
+def reverse_lines(file_name, block_size=65536):
+    """Read the lines of a file from the last one to the first one. The file
+    is read by blocks from its end, so only the lines used are read.
+    file_name: string.
+    block_size: int, optional, bytes read at once.
+    return: generator, of string lines without the line break."""
+    with open(file_name, mode='rb') as log_file:
+        position = log_file.seek(0, os.SEEK_END)
+        remainder = b''
+        while position > 0:
+            size = min(block_size, position)
+            position -= size
+            log_file.seek(position)
+            lines = (log_file.read(size) + remainder).split(b'\n')
+            # The first line can be incomplete, wait for the previous block
+            remainder = lines[0]
+            for line in reversed(lines[1:]):
+                if line:
+                    yield line.decode('utf-8', errors='replace')
+        if remainder:
+            yield remainder.decode('utf-8', errors='replace')
+
+
+def rotated_files(file_name):
+    """Log file and its rotated segments, from the newest to the oldest:
+    file_name, file_name.1, file_name.2...
+    return: generator, of file names."""
+    if os.path.isfile(file_name):
+        yield file_name
+    i = 1
+    while os.path.isfile(f'{file_name}.{i}'):
+        yield f'{file_name}.{i}'
+        i += 1
+
+
+def tail_order_events(file_name, nb_events, block_size=65536):
+    """Last order events logged by order_logger_formatter, from the newest.
+    Lines which are not json order events are skipped. The rotated segments
+    are read when the current file doesn't have enough events.
+    file_name: string, strat.log path.
+    nb_events: int, maximum number of events.
+    return: generator, of dict."""
+    if nb_events <= 0:
+        return
+    for segment in rotated_files(file_name):
+        for line in reverse_lines(segment, block_size):
+            if not line.startswith('{'):
+                continue
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue
+            if not isinstance(event, dict) or 'side' not in event\
+                or 'order_id' not in event:
+                continue
+            yield event
+            nb_events -= 1
+            if not nb_events:
+                return
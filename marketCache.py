@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# Market metadata of a marketplace kept on disk between two starts
+import json
+import os
+import threading
+from timestamps import now_ms
+
+# Fields of a ccxt market kept in the cache, info is the raw answer of the
+# marketplace and isn't needed once the market is parsed
+MARKET_FIELDS = ('id', 'symbol', 'base', 'quote', 'baseId', 'quoteId',
+                 'active', 'precision', 'limits', 'maker', 'taker',
+                 'percentage')
+
+
+class MarketCache:
+    """Symbols, precisions, limits and fees of the markets of a marketplace,
+    saved in a JSON file.
+    A cache younger than ttl is used without asking the marketplace. An
+    older one is still used, and refreshed in a background thread for the
+    next start. The marketplace is only waited for when there is no cache or
+    when it have been invalidated."""
+
+    def __init__(self, file_name, fetch_markets, ttl=86400, logger=None):
+        """file_name: string, path of the JSON file.
+        fetch_markets: function, load the markets from the marketplace and
+            return a dict with the symbols list and the markets dict.
+        ttl: int, optional, seconds a cache is fresh.
+        logger: logging object, optional, where the refresh errors go."""
+        self.file_name = file_name
+        self.fetch_markets = fetch_markets
+        self.ttl = ttl
+        self.logger = logger
+        self.refresh_thread = None
+        self.lock = threading.Lock()
+
+    def get(self):
+        """return: dict, with symbols, markets and fetched_at keys."""
+        cache = self.read()
+        if cache is None:
+            return self.refresh()
+        if now_ms() - cache['fetched_at'] > self.ttl * 1000:
+            self.refresh_in_background()
+        return cache
+
+    def read(self):
+        """return: dict, the cache on disk or None when there is none or it
+            can't be read."""
+        try:
+            with open(self.file_name) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(cache, dict) or not {'symbols', 'markets',
+            'fetched_at'} <= cache.keys():
+            return None
+        return cache
+
+    def refresh(self):
+        """Load the markets from the marketplace and save them.
+        return: dict, the new cache."""
+        data = self.fetch_markets()
+        cache = {'fetched_at': now_ms(),
+                 'symbols': list(data['symbols']),
+                 'markets': {symbol: self.market_fields(market)
+                             for symbol, market in data['markets'].items()}}
+        with self.lock:
+            # Written then renamed, a crash never leave half a file
+            tmp_file = f'{self.file_name}.tmp'
+            with open(tmp_file, 'w') as f:
+                json.dump(cache, f, default=str)
+            os.replace(tmp_file, self.file_name)
+        return cache
+
+    def market_fields(self, market):
+        """return: dict, the cached fields of a market."""
+        return {key: market[key] for key in MARKET_FIELDS if key in market}
+
+    def refresh_in_background(self):
+        """Start a refresh unless one is already running."""
+        with self.lock:
+            if self.refresh_thread and self.refresh_thread.is_alive():
+                return
+            self.refresh_thread = threading.Thread(target=self.safe_refresh,
+                name='market-cache-refresh', daemon=True)
+            self.refresh_thread.start()
+
+    def safe_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            if self.logger:
+                self.logger.warning(f'Market cache refresh failed: {e}')
+
+    def invalidate(self):
+        """Remove the cache, the next get() wait for the marketplace."""
+        with self.lock:
+            try:
+                os.remove(self.file_name)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+# Counters and latency histograms, exported to a file
+import json
+import os
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from time import perf_counter, time
+
+# Upper bounds in seconds of the latency buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+                   30)
+# Upper bounds of the buckets counting things per cycle
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Distribution of observed values, Prometheus like: each bucket count
+    the values lower or equal to its upper bound."""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """return: list, of (upper bound, cumulative count), the last bound
+            is '+Inf'."""
+        total = 0
+        result = []
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class MetricsRegistry:
+    """Thread safe store of the counters and histograms of the bot.
+    Metrics are identified by a name and labels given as keyword arguments.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def key(self, name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        """Add value to a counter."""
+        key = self.key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def value(self, name, **labels):
+        """return: int, the value of a counter."""
+        with self.lock:
+            return self.counters.get(self.key(name, labels), 0)
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        """Add a value to a histogram.
+        buckets: tuple, optional, upper bounds used when the histogram is
+            created."""
+        key = self.key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Observe the wall time spent in a with block, in seconds."""
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, perf_counter() - start, **labels)
+
+    def to_dict(self):
+        """return: dict, every metric in a json serializable form."""
+        with self.lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in self.counters.items()]
+            histograms = [{'name': name, 'labels': dict(labels),
+                           'buckets': histogram.cumulative(),
+                           'sum': histogram.sum, 'count': histogram.count}
+                          for (name, labels), histogram in
+                          self.histograms.items()]
+        return {'timestamp': time(), 'counters': counters,
+                'histograms': histograms}
+
+    def to_prometheus(self):
+        """return: string, every metric in the Prometheus text format."""
+        metrics = self.to_dict()
+        lines = []
+        typed = set()
+        for counter in sorted(metrics['counters'],
+            key=lambda item: item['name']):
+            if counter['name'] not in typed:
+                typed.add(counter['name'])
+                lines.append(f"# TYPE {counter['name']} counter")
+            lines.append(f"{counter['name']}"
+                f"{format_labels(counter['labels'])} {counter['value']}")
+        for histogram in sorted(metrics['histograms'],
+            key=lambda item: item['name']):
+            name = histogram['name']
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} histogram')
+            for bound, count in histogram['buckets']:
+                labels = format_labels({**histogram['labels'],
+                    'le': str(bound)})
+                lines.append(f'{name}_bucket{labels} {count}')
+            labels = format_labels(histogram['labels'])
+            lines.append(f"{name}_sum{labels} {histogram['sum']}")
+            lines.append(f"{name}_count{labels} {histogram['count']}")
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    """return: string, labels in the Prometheus text format."""
+    if not labels:
+        return ''
+    items = ','.join(f'{key}="{str(value)}"' for key, value in
+        sorted(labels.items()))
+    return f'{{{items}}}'
+
+
+class MetricsExporter:
+    """Write the metrics of a registry to a file every interval seconds,
+    from a daemon thread. The file is replaced atomically so a reader never
+    see a partial export."""
+
+    def __init__(self, registry, file_name, interval=15, fmt='prometheus'):
+        """registry: MetricsRegistry object.
+        file_name: string, where the metrics are written.
+        interval: float, optional, seconds between two exports.
+        fmt: string, optional, prometheus or json."""
+        if fmt not in ('prometheus', 'json'):
+            raise ValueError(f'Unknown metrics format {fmt}')
+        self.registry = registry
+        self.file_name = file_name
+        self.interval = interval
+        self.fmt = fmt
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def export(self):
+        if self.fmt == 'json':
+            content = json.dumps(self.registry.to_dict())
+        else:
+            content = self.registry.to_prometheus()
+        temp_file = f'{self.file_name}.tmp'
+        with open(temp_file, mode='w', encoding='utf-8') as metrics_file:
+            metrics_file.write(content)
+        os.replace(temp_file, self.file_name)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.export()
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run,
+                name='metrics-exporter', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Stop the thread and write a last export."""
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.export()
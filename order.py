@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# Compact record of an order, built from the marketplace payloads
+from decimal import Decimal
+from functools import lru_cache
+
+from fixedPoint import FixedPoint
+
+
+@lru_cache(maxsize=8192, typed=True)
+def cached_decimal(nb):
+    return Decimal(str(nb))
+
+
+def to_decimal(nb):
+    """Convert a price or an amount to Decimal. Orders of a grid share a few
+    prices, conversions are cached.
+    nb: Decimal, float, int or string.
+    return: Decimal."""
+    if isinstance(nb, Decimal):
+        return nb
+    return cached_decimal(nb)
+
+
+class Order:
+    """Immutable order. value is only computed when it's asked for the first
+    time, fees_coef is the fees coefficient applied to it and fixed_point the
+    precision it is rounded to.
+    Orders are equal when all their fields are equal, like the lists of 6
+    items they replace."""
+
+    __slots__ = ('id', 'price', 'amount', 'timestamp', 'date', 'side',
+                 '_value')
+    fees_coef = Decimal('0.9975')
+    fixed_point = FixedPoint()
+
+    def __init__(self, order_id, price, amount, timestamp, date, side=None):
+        """order_id: string, order unique identifier, None for fake orders.
+        price: Decimal, float or string.
+        amount: Decimal, float or string.
+        timestamp: int.
+        date: string.
+        side: string, optional, buy, sell, cancel_buy or cancel_sell."""
+        setter = object.__setattr__
+        setter(self, 'id', order_id)
+        setter(self, 'price', to_decimal(price))
+        setter(self, 'amount', to_decimal(amount))
+        setter(self, 'timestamp', timestamp)
+        setter(self, 'date', date)
+        setter(self, 'side', side)
+        setter(self, '_value', None)
+
+    @classmethod
+    def from_ccxt(cls, order):
+        """order: dict, order formatted by ccxt.
+        return: Order object."""
+        return cls(order['id'], order['price'], order['amount'],
+                   order['timestamp'], order['datetime'], order['side'])
+
+    @classmethod
+    def from_ccxt_list(cls, orders):
+        """Bulk constructor for a whole fetch_open_orders or fetch_trades
+        response.
+        orders: list, of orders formatted by ccxt.
+        return: dict, containing list of buys & sells."""
+        sides = {'sell': [], 'buy': []}
+        for order in orders:
+            side = sides.get(order['side'])
+            if side is not None:
+                side.append(cls(order['id'], order['price'], order['amount'],
+                    order['timestamp'], order['datetime'], order['side']))
+        return sides
+
+    @staticmethod
+    def by_side(orders):
+        """Split a list of Order by side, for marketplaces already giving
+        Order records.
+        orders: list, of Order objects.
+        return: dict, containing list of buys & sells."""
+        sides = {'sell': [], 'buy': []}
+        for order in orders:
+            side = sides.get(order.side)
+            if side is not None:
+                side.append(order)
+        return sides
+
+    @property
+    def value(self):
+        """return: Decimal, price * amount * fees_coef, rounded."""
+        if self._value is None:
+            object.__setattr__(self, '_value', self.fixed_point.multiplier(
+                self.price, self.amount, self.fees_coef))
+        return self._value
+
+    def key(self):
+        return (self.id, self.price, self.amount, self.timestamp, self.date,
+                self.side)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('Order objects are immutable')
+
+    def __delattr__(self, name):
+        raise AttributeError('Order objects are immutable')
+
+    def __eq__(self, other):
+        if not isinstance(other, Order):
+            return NotImplemented
+        return self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        side = f'{self.side} ' if self.side else ''
+        return (f'Order({side}id: {self.id}, price: {self.price}, amount: '
+                f'{self.amount}, timestamp: {self.timestamp})')
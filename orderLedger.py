@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+# In-memory book of the orders opened by the strategy
+from bisect import bisect_left, insort
+
+
+class LedgerSide:
+    """Orders of one side of the ledger, indexed by their grid price.
+    Iteration and positional access follow the price order, [0] is the
+    lowest price and [-1] the highest one, like the lists it replaces.
+    Several orders can sit at the same price, like on the marketplace, they
+    follow the order they have been added in.
+    Lookup by price is a dict access. Insert and remove also keep a sorted
+    price list, to give ordered iteration and positional access without
+    sorting: a bisect then a list shift, O(n) in the middle of the grid but
+    O(1) at its ends, where the strategy adds and removes its orders."""
+
+    def __init__(self, ledger, orders=None):
+        """ledger: OrderLedger object, which keep the index by id.
+        orders: list, optional, orders to add."""
+        self.ledger = ledger
+        # Orders by price, in the order they have been added
+        self.by_price = {}
+        # One price per order
+        self.prices = []
+        if orders:
+            for order in orders:
+                self.add(order)
+
+    def add(self, order):
+        """Add an order, after the orders already set at the same price.
+        order: Order object."""
+        self.by_price.setdefault(order.price, []).append(order)
+        insort(self.prices, order.price)
+        self.ledger.index(order)
+
+    def remove(self, order):
+        """Remove an order.
+        order: Order object.
+        raise: ValueError, when the order isn't in the ledger."""
+        orders = self.by_price.get(order.price, [])
+        orders.remove(order)
+        if not orders:
+            del self.by_price[order.price]
+        del self.prices[bisect_left(self.prices, order.price)]
+        self.ledger.unindex(order)
+
+    def pop_price(self, price):
+        """Remove and return the first order set at a price.
+        price: Decimal.
+        return: Order object, the removed order."""
+        order = self.by_price[price][0]
+        self.remove(order)
+        return order
+
+    def get(self, price, default=None):
+        """return: Order object, the first order set at price or default."""
+        orders = self.by_price.get(price)
+        return orders[0] if orders else default
+
+    def snapshot(self):
+        """return: list, orders ordered by price."""
+        orders = []
+        for price in self.prices:
+            if not orders or orders[-1].price != price:
+                orders.extend(self.by_price[price])
+        return orders
+
+    def __contains__(self, price):
+        return price in self.by_price
+
+    def __len__(self):
+        return len(self.prices)
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return self.snapshot()[position]
+        price = self.prices[position]
+        if position < 0:
+            position += len(self.prices)
+        return self.by_price[price][
+            position - bisect_left(self.prices, price)]
+
+    def __delitem__(self, position):
+        self.remove(self[position])
+
+    def __repr__(self):
+        return repr(self.snapshot())
+
+
+class OrderLedger:
+    """Orders opened by the strategy, indexed by side and grid price and by
+    order id. ledger['buy'] and ledger['sell'] are LedgerSide objects."""
+
+    def __init__(self, orders=None):
+        """orders: dict, optional, containing list of buys & sells."""
+        self.by_id = {}
+        self.sides = {'buy': LedgerSide(self), 'sell': LedgerSide(self)}
+        if orders:
+            for side, side_orders in orders.items():
+                for order in side_orders:
+                    self.sides[side].add(order)
+
+    def index(self, order):
+        # Fake orders don't have any id
+        if order.id:
+            self.by_id[order.id] = order
+
+    def unindex(self, order):
+        if order.id:
+            self.by_id.pop(order.id, None)
+
+    def get_by_id(self, order_id, default=None):
+        """return: Order object, the order with this id or default."""
+        return self.by_id.get(order_id, default)
+
+    def snapshot(self):
+        """return: dict, containing list of buys & sells ordered by price."""
+        return {'buy': self.sides['buy'].snapshot(),
+                'sell': self.sides['sell'].snapshot()}
+
+    def __getitem__(self, side):
+        return self.sides[side]
+
+    def __repr__(self):
+        return repr(self.snapshot())
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+# Rate limitation and retry of every request sent to a marketplace
+import random
+import threading
+from collections import deque
+from time import monotonic, perf_counter, sleep
+
+
+class TokenBucket:
+    """Token bucket shared by every request sent to one marketplace.
+    Tokens are added at the highest rate allowed by the marketplace, up to
+    capacity, so a burst can use the tokens saved during quiet periods."""
+
+    def __init__(self, rate, capacity=None):
+        """rate: float, tokens added per second. None or 0 disable the
+            limitation.
+        capacity: int, optional, maximum number of tokens saved."""
+        self.rate = rate
+        self.capacity = capacity if capacity else max(1, int(rate or 1))
+        self.tokens = float(self.capacity)
+        self.last_refill = monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self):
+        """Add the tokens earned since the last refill. Need the lock."""
+        now = monotonic()
+        self.tokens = min(self.capacity,
+            self.tokens + (now - self.last_refill) * self.rate)
+        self.last_refill = now
+
+    def acquire(self, tokens=1):
+        """Wait until enough tokens are available and consume them.
+        tokens: int, optional, cost of the request."""
+        if not self.rate:
+            return
+        while True:
+            with self.lock:
+                self.refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            sleep(wait)
+
+    def available(self):
+        """return: float, ratio of tokens available, between 0 and 1."""
+        if not self.rate:
+            return 1.0
+        with self.lock:
+            self.refill()
+            return self.tokens / self.capacity
+
+
+class ApiRequester:
+    """Send requests through a token bucket and retry them in a loop with an
+    exponential backoff and jitter. Errors are counted per endpoint and
+    checked against an error budget: when error_budget errors
+    happened during the last budget_window seconds, retries wait max_delay.
+    When a MetricsRegistry is given, the latency of each try is observed in
+    api_request_seconds and errors and retries are counted per endpoint.
+    The wait between two tries is done by sleep, the clock of a fake
+    marketplace can be given instead of time.sleep.
+    """
+
+    def __init__(self, bucket, logger, base_delay=0.5, max_delay=30,
+        error_budget=10, budget_window=60, metrics=None, sleep=sleep):
+        self.bucket = bucket
+        self.logger = logger
+        self.metrics = metrics
+        self.sleep = sleep
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.error_budget = error_budget
+        self.budget_window = budget_window
+        self.counters = {}
+        self.recent_errors = deque()
+        self.lock = threading.Lock()
+
+    def call(self, endpoint, func, *args, recover=None, **kwargs):
+        """Call func until it succeed.
+        endpoint: string, name of the request, used by the error counters.
+        func: function, the request to send.
+        recover: function, optional, called after an error. When it return
+            something else than None, it is returned instead of retrying.
+        return: the return of func or recover."""
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            start = perf_counter()
+            try:
+                result = func(*args, **kwargs)
+                self.observe(endpoint, start, 'ok')
+                self.count(endpoint, 'calls')
+                return result
+            except Exception as e:
+                self.observe(endpoint, start, 'error')
+                self.logger.warning(f'WARNING: {endpoint} {e}')
+                self.record_error(endpoint)
+                self.sleep(self.backoff(attempt))
+                attempt += 1
+                self.count(endpoint, 'retries')
+                if recover:
+                    rsp = recover()
+                    if rsp is not None:
+                        return rsp
+
+    def backoff(self, attempt):
+        """Delay before the next try, exponential with jitter.
+        attempt: int, number of failed tries.
+        return: float, seconds."""
+        if self.budget_exhausted():
+            return self.max_delay
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return random.uniform(delay / 2, delay)
+
+    def observe(self, endpoint, start, status):
+        if self.metrics:
+            self.metrics.observe('api_request_seconds',
+                perf_counter() - start, endpoint=endpoint, status=status)
+
+    def count(self, endpoint, counter):
+        with self.lock:
+            counters = self.counters.setdefault(endpoint,
+                {'calls': 0, 'errors': 0, 'retries': 0})
+            counters[counter] += 1
+        if self.metrics:
+            self.metrics.inc(f'api_{counter}_total', endpoint=endpoint)
+
+    def record_error(self, endpoint):
+        """Count an error and warn once when it exhausts the error budget,
+        the next errors of the window don't warn again."""
+        self.count(endpoint, 'errors')
+        with self.lock:
+            used = self.errors_in_window()
+            self.recent_errors.append(monotonic())
+        if used + 1 == self.error_budget:
+            #send mail
+            self.logger.warning(
+                f'api error budget exhausted: {self.error_budget} '
+                f'errors in {self.budget_window}s, last on {endpoint}')
+
+    def budget_left(self):
+        """return: float, ratio of the error budget left, between 0 and 1."""
+        with self.lock:
+            used = self.errors_in_window()
+        return max(0.0, 1 - used / self.error_budget)
+
+    def errors_in_window(self):
+        """Drop the errors older than the budget window, the lock must be
+        held.
+        return: int, number of errors in the window."""
+        limit = monotonic() - self.budget_window
+        while self.recent_errors and self.recent_errors[0] < limit:
+            self.recent_errors.popleft()
+        return len(self.recent_errors)
+
+    def budget_exhausted(self):
+        return self.budget_left() == 0
+
+    def stats(self):
+        """return: dict, calls, errors and retries per endpoint."""
+        with self.lock:
+            return {k: dict(v) for k, v in self.counters.items()}
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+# Adaptive delay between two cycles of the strategy
+import math
+
+
+class PollScheduler:
+    """Choose the delay before the next cycle of main_loop.
+    The delay is short when the last price is close to the spread of the
+    strategy or when orders have been filled recently, long when the market
+    is quiet. It grows when the rate limit or error budget is low."""
+
+    def __init__(self, logger, min_interval=1, max_interval=20,
+        near_levels=3, smoothing=0.3):
+        """logger: logging object, where decisions are logged.
+        min_interval: float, optional, shortest delay in seconds.
+        max_interval: float, optional, longest delay in seconds.
+        near_levels: int, optional, distance in grid levels from where the
+            price is considered far from the spread.
+        smoothing: float, optional, weight of the last cycle in the fill
+            rate moving average."""
+        self.logger = logger
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.near_levels = near_levels
+        self.smoothing = smoothing
+        self.fill_rate = 0.0
+
+    def levels_to_spread(self, price, spread_bot, spread_top, increment):
+        """Distance between the price and the closest side of the spread.
+        return: float, in number of grid levels."""
+        price = float(price)
+        if price <= 0:
+            return 0.0
+        ratio = min(abs(math.log(price / float(spread_bot))),
+                    abs(math.log(float(spread_top) / price)))
+        return ratio / math.log(float(increment))
+
+    def next_interval(self, price, spread_bot, spread_top, increment,
+        nb_fills, budget_left):
+        """Compute the delay before the next cycle.
+        price: Decimal, last price of the market.
+        spread_bot: Decimal, highest buy price of the strategy.
+        spread_top: Decimal, lowest sell price of the strategy.
+        increment: Decimal, increment coefficient between two levels.
+        nb_fills: int, number of fills detected during the last cycle.
+        budget_left: float, ratio of the request budget left, 0 to 1.
+        return: float, seconds."""
+        self.fill_rate = self.smoothing * nb_fills + \
+            (1 - self.smoothing) * self.fill_rate
+        levels = self.levels_to_spread(price, spread_bot, spread_top,
+            increment)
+        closeness = max(0.0, 1 - levels / self.near_levels)
+        activity = max(closeness, min(1.0, self.fill_rate))
+        interval = self.max_interval - \
+            (self.max_interval - self.min_interval) * activity
+        # Slow down when there is not much budget left
+        interval /= max(budget_left, self.min_interval / self.max_interval)
+        interval = min(self.max_interval, max(self.min_interval, interval))
+        self.logger.debug(
+            f'next cycle in {interval:.2f}s, price: {price}, levels to '
+            f'spread: {levels:.2f}, fill rate: {self.fill_rate:.2f}, '
+            f'budget left: {budget_left:.2f}')
+        return interval
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+# Persistent state of the strategy in an embedded SQLite database
+import json
+import sqlite3
+import threading
+from operator import attrgetter
+from order import Order
+from timestamps import now_ms
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS params (
+    version INTEGER PRIMARY KEY AUTOINCREMENT,
+    market TEXT NOT NULL,
+    created_at INTEGER NOT NULL,
+    params TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS order_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    market TEXT NOT NULL,
+    event TEXT NOT NULL,
+    order_id TEXT,
+    price TEXT NOT NULL,
+    amount TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    datetime TEXT);
+CREATE INDEX IF NOT EXISTS order_events_timestamp
+    ON order_events (market, timestamp);
+CREATE TABLE IF NOT EXISTS ledger (
+    market TEXT NOT NULL,
+    side TEXT NOT NULL,
+    price TEXT NOT NULL,
+    order_id TEXT,
+    amount TEXT NOT NULL,
+    value TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    datetime TEXT);
+CREATE INDEX IF NOT EXISTS ledger_market ON ledger (market, side, price);
+CREATE TABLE IF NOT EXISTS state (
+    market TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    PRIMARY KEY (market, key));
+CREATE TABLE IF NOT EXISTS trades (
+    market TEXT NOT NULL,
+    trade_key TEXT NOT NULL,
+    side TEXT NOT NULL,
+    trade_id TEXT,
+    price TEXT NOT NULL,
+    amount TEXT NOT NULL,
+    timestamp INTEGER NOT NULL,
+    datetime TEXT,
+    PRIMARY KEY (market, trade_key));
+CREATE INDEX IF NOT EXISTS trades_timestamp ON trades (market, timestamp);
+'''
+
+
+class StateStore:
+    """Parameters versions, order lifecycle events and the current ledger of
+    the strategy and the user trade history, kept in a SQLite database in
+    WAL mode.
+    Order events are buffered in memory and written with the ledger in one
+    transaction by flush(), once per cycle. Everything needed to resume the
+    strategy after a crash is then a local query away."""
+
+    def __init__(self, file_name):
+        """file_name: string, path of the database, created when none."""
+        self.file_name = file_name
+        self.connection = sqlite3.connect(file_name, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.migrate_ledger()
+        self.connection.executescript(SCHEMA)
+        self.pending_events = []
+        self.lock = threading.Lock()
+
+    def migrate_ledger(self):
+        """The ledger table of the first databases had one order per price,
+        its orders are copied to a table without this key."""
+        row = self.connection.execute("SELECT sql FROM sqlite_master WHERE "
+            "type = 'table' AND name = 'ledger'").fetchone()
+        if not row or 'PRIMARY KEY' not in row[0]:
+            return
+        self.connection.executescript(f'''
+            BEGIN;
+            ALTER TABLE ledger RENAME TO ledger_old;
+            {SCHEMA}
+            INSERT INTO ledger SELECT * FROM ledger_old;
+            DROP TABLE ledger_old;
+            COMMIT;''')
+
+    def save_params(self, market, params):
+        """Add a new version of the parameters.
+        market: string, market name.
+        params: dict, LW parameters.
+        return: int, the version number."""
+        text = json.dumps({key: str(value) for key, value in params.items()})
+        with self.lock, self.connection:
+            cursor = self.connection.execute('INSERT INTO params (market, '
+                'created_at, params) VALUES (?, ?, ?)',
+                (market, now_ms(), text))
+            return cursor.lastrowid
+
+    def last_params(self, market):
+        """return: dict, last parameters saved for a market, values are
+            strings, or None."""
+        with self.lock:
+            row = self.connection.execute('SELECT params FROM params WHERE '
+                'market = ? ORDER BY version DESC LIMIT 1', (market,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def record_event(self, market, event, order_id, price, amount, timestamp,
+        date):
+        """Buffer an order event until the next flush.
+        event: string, buy, sell, cancel_buy, cancel_sell, fill_buy or
+            fill_sell."""
+        with self.lock:
+            self.pending_events.append((market, event,
+                str(order_id) if order_id else None, str(price), str(amount),
+                int(timestamp), str(date)))
+
+    def flush(self, market, ledger=None, state=None, force=False):
+        """Write the buffered events, the ledger and the state values in one
+        transaction. The ledger is only rewritten when events happened since
+        the last flush, or when force is True.
+        ledger: dict, optional, containing list of buys & sells.
+        state: dict, optional, values saved under their key.
+        return: int, number of events written."""
+        with self.lock:
+            events = self.pending_events
+            self.pending_events = []
+            with self.connection:
+                self.connection.executemany('INSERT INTO order_events '
+                    '(market, event, order_id, price, amount, timestamp, '
+                    'datetime) VALUES (?, ?, ?, ?, ?, ?, ?)', events)
+                if ledger is not None and (events or force):
+                    self.connection.execute(
+                        'DELETE FROM ledger WHERE market = ?', (market,))
+                    self.connection.executemany('INSERT INTO ledger '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                        [(market, side, str(order.price),
+                          str(order.id) if order.id else None,
+                          str(order.amount), str(order.value),
+                          int(order.timestamp), str(order.date))
+                         for side in ('buy', 'sell') for order in ledger[side]])
+                if state:
+                    self.connection.executemany('INSERT OR REPLACE INTO state '
+                        'VALUES (?, ?, ?)', [(market, key, json.dumps(value))
+                        for key, value in state.items()])
+        return len(events)
+
+    def load_ledger(self, market):
+        """return: dict, containing list of buys & sells ordered by price."""
+        ledger = {'buy': [], 'sell': []}
+        with self.lock:
+            rows = self.connection.execute('SELECT side, order_id, price, '
+                'amount, timestamp, datetime FROM ledger WHERE market = ?',
+                (market,)).fetchall()
+        for side, order_id, price, amount, timestamp, date in rows:
+            ledger[side].append(Order(order_id, price, amount, timestamp,
+                date, side))
+        for side in ledger:
+            ledger[side].sort(key=attrgetter('price'))
+        return ledger
+
+    def get_state(self, market, key, default=None):
+        """return: the value saved under key or default."""
+        with self.lock:
+            row = self.connection.execute('SELECT value FROM state WHERE '
+                'market = ? AND key = ?', (market, key)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def events(self, market, since=0):
+        """return: list, of the order events done since a timestamp."""
+        with self.lock:
+            return self.connection.execute('SELECT event, order_id, price, '
+                'amount, timestamp, datetime FROM order_events WHERE '
+                'market = ? AND timestamp >= ? ORDER BY id',
+                (market, since)).fetchall()
+
+    def save_trades(self, market, trades, numbers=None):
+        """Add trades to the history, the ones already saved are ignored.
+        Identical trades, like two partial fills of the same amount in the
+        same second on Zebitex, are told apart by their number.
+        trades: list, of Order objects.
+        numbers: list, optional, number of each trade among the identical
+            ones, counted in the order trades are given by default, which
+            then have to be every trade since a timestamp.
+        return: int, number of new trades."""
+        occurrences = {}
+        rows = []
+        for i, trade in enumerate(trades):
+            key = self.trade_key(trade)
+            occurrences[key] = occurrences.get(key, 0) + 1
+            number = numbers[i] if numbers else occurrences[key]
+            rows.append((market, f'{key}|{number}', trade.side,
+                str(trade.id) if trade.id else None, str(trade.price),
+                str(trade.amount), int(trade.timestamp), str(trade.date)))
+        with self.lock, self.connection:
+            before = self.connection.total_changes
+            self.connection.executemany('INSERT OR IGNORE INTO trades VALUES '
+                '(?, ?, ?, ?, ?, ?, ?, ?)', rows)
+            return self.connection.total_changes - before
+
+    def trade_key(self, trade):
+        """return: string, identify a trade even without id."""
+        return (f'{trade.id}|{trade.side}|{trade.price}|{trade.amount}|'
+                f'{trade.timestamp}')
+
+    def last_trade_timestamp(self, market):
+        """return: int, timestamp of the last saved trade or None."""
+        with self.lock:
+            row = self.connection.execute('SELECT MAX(timestamp) FROM trades '
+                'WHERE market = ?', (market,)).fetchone()
+        return row[0]
+
+    def load_trades(self, market, since=0):
+        """return: dict, containing list of buys & sells done since a
+            timestamp, ordered by timestamp."""
+        trades = {'buy': [], 'sell': []}
+        with self.lock:
+            rows = self.connection.execute('SELECT side, trade_id, price, '
+                'amount, timestamp, datetime FROM trades WHERE market = ? AND '
+                'timestamp >= ? ORDER BY timestamp', (market, since)).fetchall()
+        for side, trade_id, price, amount, timestamp, date in rows:
+            if side in trades:
+                trades[side].append(Order(trade_id, price, amount, timestamp,
+                    date, side))
+        return trades
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+# Structured logging, messages are only built when a handler need them
+import logging
+import threading
+
+
+def snapshot_value(value):
+    """Copy the containers of a payload value, the orders they hold being
+    immutable.
+    return: the value as it is now."""
+    if hasattr(value, 'snapshot'):
+        # OrderLedger and LedgerSide
+        return value.snapshot()
+    if isinstance(value, dict):
+        return {key: snapshot_value(item) for key, item in value.items()}
+    if isinstance(value, (list, set)):
+        return type(value)(value)
+    return value
+
+
+class LazyEvent:
+    """Message of a log record with a key/value payload. It is rendered by
+    str(), which logging only call when the record is emitted."""
+
+    __slots__ = ('msg', 'args', 'fields')
+
+    def __init__(self, msg, args, fields):
+        self.msg = msg
+        self.args = args
+        self.fields = fields
+
+    def snapshot(self):
+        """return: LazyEvent, with a copy of the payload which can still be
+            rendered once the strategy changed it."""
+        return LazyEvent(self.msg, self.args, {key: snapshot_value(value)
+                         for key, value in self.fields.items()})
+
+    def __str__(self):
+        msg = self.msg % self.args if self.args else str(self.msg)
+        if not self.fields:
+            return msg
+        payload = ', '.join(f'{key}: {value}'
+                            for key, value in self.fields.items())
+        return f'{msg} {payload}'
+
+
+class StructLogger:
+    """Wrap a logger so events carry fields which are only rendered when the
+    logger level let them through, so nothing is built when no handler will
+    write them. The level of a logger set by logger_setup is the lowest
+    level of its handlers.
+    sample=n only let one call out of n through for a given message, for
+    the dumps done every cycle."""
+
+    def __init__(self, logger):
+        """logger: logging object."""
+        self.logger = logger
+        self.sample_counters = {}
+        self.sample_lock = threading.Lock()
+
+    def sampled_out(self, msg, sample):
+        """return: bool, True when this call is not part of the sample."""
+        with self.sample_lock:
+            count = self.sample_counters.get(msg, 0)
+            self.sample_counters[msg] = count + 1
+        return count % sample != 0
+
+    def log(self, level, msg, *args, sample=None, **fields):
+        if not self.logger.isEnabledFor(level):
+            return
+        if sample and sample > 1 and self.sampled_out(msg, sample):
+            return
+        self.logger.log(level, LazyEvent(msg, args, fields))
+
+    def debug(self, msg, *args, sample=None, **fields):
+        self.log(logging.DEBUG, msg, *args, sample=sample, **fields)
+
+    def info(self, msg, *args, sample=None, **fields):
+        self.log(logging.INFO, msg, *args, sample=sample, **fields)
+
+    def warning(self, msg, *args, sample=None, **fields):
+        self.log(logging.WARNING, msg, *args, sample=sample, **fields)
+
+    def error(self, msg, *args, sample=None, **fields):
+        self.log(logging.ERROR, msg, *args, sample=sample, **fields)
+
+    def critical(self, msg, *args, sample=None, **fields):
+        self.log(logging.CRITICAL, msg, *args, sample=sample, **fields)
+
+    def isEnabledFor(self, level):
+        return self.logger.isEnabledFor(level)
+
+    def __getattr__(self, name):
+        return getattr(self.logger, name)
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+# Parameter sweep of the backtester on all the CPU cores
+import argparse
+import heapq
+import itertools
+import json
+import os
+from decimal import Decimal
+from multiprocessing import Pool, shared_memory
+
+import numpy as np
+
+from backtester import backtest, load_price_series
+
+# Price series of the worker processes, attached once by init_worker
+worker_memory = None
+worker_prices = None
+
+
+def parse_values(spec):
+    """Read a list of values or a range of values.
+    spec: string, 'v1,v2,v3' or 'start:stop:step' with stop included.
+    return: list, of Decimal."""
+    if ':' not in spec:
+        return [Decimal(value) for value in spec.split(',')]
+    start, stop, step = (Decimal(value) for value in spec.split(':'))
+    if step <= 0:
+        raise ValueError(f'The step of {spec} must be positive')
+    values = []
+    value = start
+    while value <= stop:
+        values.append(value)
+        value += step
+    return values
+
+
+def candidates(increment_coefs, range_bots, range_tops, amounts,
+    benef_allocs):
+    """Every parameters combination with a valid range.
+    return: generator, of dict."""
+    for increment_coef, range_bot, range_top, amount, benef_alloc in \
+        itertools.product(increment_coefs, range_bots, range_tops, amounts,
+            benef_allocs):
+        if range_bot >= range_top:
+            continue
+        yield {'increment_coef': str(increment_coef),
+               'range_bot': str(range_bot),
+               'range_top': str(range_top),
+               'amount': str(amount),
+               'benef_alloc': int(benef_alloc)}
+
+
+def init_worker(memory_name, length):
+    """Attach the shared price series, without copying it."""
+    global worker_memory, worker_prices
+    worker_memory = shared_memory.SharedMemory(name=memory_name)
+    worker_prices = np.ndarray((length,), dtype=np.float64,
+        buffer=worker_memory.buf)
+
+
+def run_candidate(params):
+    """Backtest one set of parameters with the shared price series.
+    return: dict, parameters and results, or the error."""
+    try:
+        result = backtest(worker_prices, params['range_bot'],
+            params['range_top'], params['increment_coef'], params['amount'],
+            params['benef_alloc'])
+    except ValueError as e:
+        return {'params': params, 'error': str(e)}
+    return {'params': params, 'result': result._asdict()}
+
+
+def sweep(prices, params, results_file, ranked_file, top=100, processes=None,
+    chunksize=16):
+    """Backtest all the parameters on a process pool.
+    Each result is written to results_file as soon as it arrives, one json
+    per line. The best ones, by pnl, are written to ranked_file at the end.
+    prices: numpy array, of float prices.
+    params: iterable, of dict, the candidates.
+    results_file, ranked_file: string, file names.
+    top: int, optional, number of ranked results kept.
+    processes: int, optional, number of workers, all cores by default.
+    return: list, of the ranked results."""
+    prices = np.ascontiguousarray(prices, dtype=np.float64)
+    memory = shared_memory.SharedMemory(create=True, size=prices.nbytes)
+    best = []
+    try:
+        np.ndarray(prices.shape, dtype=np.float64, buffer=memory.buf)[:] = \
+            prices
+        with Pool(processes, initializer=init_worker,
+            initargs=(memory.name, len(prices))) as pool, \
+            open(results_file, mode='w', encoding='utf-8') as output:
+            for i, line in enumerate(pool.imap_unordered(run_candidate,
+                params, chunksize)):
+                output.write(json.dumps(line) + '\n')
+                if 'result' not in line:
+                    continue
+                item = (line['result']['pnl'], i, line)
+                if len(best) < top:
+                    heapq.heappush(best, item)
+                else:
+                    heapq.heappushpop(best, item)
+    finally:
+        memory.close()
+        memory.unlink()
+    ranked = [item[2] for item in sorted(best, reverse=True)]
+    with open(ranked_file, mode='w', encoding='utf-8') as output:
+        for line in ranked:
+            output.write(json.dumps(line) + '\n')
+    return ranked
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Backtest every combination of LW parameters. Values "
+        "are 'v1,v2' lists or 'start:stop:step' ranges.")
+    parser.add_argument('prices', help="file with one 'price' or "
+        "'timestamp,price' per line")
+    parser.add_argument('--increment-coef', required=True)
+    parser.add_argument('--range-bot', required=True)
+    parser.add_argument('--range-top', required=True)
+    parser.add_argument('--amount', required=True)
+    parser.add_argument('--benef-alloc', default='0')
+    parser.add_argument('--top', type=int, default=100)
+    parser.add_argument('--processes', type=int, default=os.cpu_count())
+    parser.add_argument('--results', default='sweep_results.jsonl')
+    parser.add_argument('--ranked', default='sweep_ranked.jsonl')
+    args = parser.parse_args()
+    params = candidates(parse_values(args.increment_coef),
+        parse_values(args.range_bot), parse_values(args.range_top),
+        parse_values(args.amount), parse_values(args.benef_alloc))
+    ranked = sweep(load_price_series(args.prices), params, args.results,
+        args.ranked, args.top, args.processes)
+    for line in ranked[:10]:
+        print(f"pnl: {line['result']['pnl']:.8f} {line['params']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+# Regression run of the strategy on the fake marketplace
+import json
+import math
+import os
+import sys
+import tempfile
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+from LazyStarter import LazyStarter
+from fakeExchange import EndOfPricePath
+
+BALANCE = {'BTC': '10', 'ETH': '10000'}
+FEES = Decimal('0.0015')
+PARAMS = {'datetime': '2020-01-01 00:00:00.000000', 'market': 'ETH/BTC',
+          'range_bot': '0.01', 'range_top': '0.03', 'increment_coef': '1.01',
+          'amount': '1', 'spread_bot': '0.01986895',
+          'spread_top': '0.02006764', 'stop_at_bot': 'False',
+          'stop_at_top': 'False', 'nb_buy_to_display': '10',
+          'nb_sell_to_display': '10', 'benef_alloc': '50'}
+
+
+def price_path():
+    """Prices going a few grid levels down and up around the spread, with
+    some jumps of several levels in one tick.
+    return: list, of string prices."""
+    prices = []
+    for i in range(400):
+        levels = 8 * math.sin(i / 15) + 3 * math.sin(i / 4)
+        prices.append(f'{0.02 * 1.01 ** levels:.8f}')
+    return prices
+
+
+class FakeExchangeRunTest(unittest.TestCase):
+    """Play a scripted price path in headless mode until its end, then
+    compare what LW knows with the book and the balances of the fake
+    marketplace."""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.TemporaryDirectory()
+        os.chdir(self.directory.name)
+        with open('prices.txt', 'w') as f:
+            f.write('\n'.join(price_path()))
+        with open('keys.txt', 'w') as f:
+            json.dump({'fake': {'price_path': 'prices.txt', 'tick': 5,
+                                'balance': BALANCE}}, f)
+        with open('params.txt', 'w') as f:
+            json.dump(PARAMS, f)
+        # LW files are written next to the script it is started from
+        with mock.patch.object(sys, 'argv', ['LazyStarter.py']):
+            self.bot = LazyStarter()
+        self.bot.headless_init()
+        with self.assertRaises(EndOfPricePath):
+            self.bot.main()
+
+    def tearDown(self):
+        self.bot.metrics_exporter.stop()
+        self.bot.stop_logging()
+        self.bot.state_store.connection.close()
+        os.chdir(self.cwd)
+        self.directory.cleanup()
+
+    def test_trades_done(self):
+        self.assertGreater(len(self.bot.exchange.trades), 20)
+
+    def test_ledger_matches_book(self):
+        exchange = self.bot.exchange
+        filled = {trade['order'] for trade in exchange.trades}
+        for side in ('buy', 'sell'):
+            book_ids = {order['id'] for order in exchange.book[side]}
+            ledger_ids = [order.id for order in self.bot.open_orders[side]
+                          if order.id]
+            self.assertEqual(len(ledger_ids), len(set(ledger_ids)))
+            # Every open order is known by LW
+            self.assertEqual(book_ids - set(ledger_ids), set(), side)
+            # A filled order can stay until the next cycle reacts to it,
+            # a canceled one never
+            self.assertEqual(set(ledger_ids) - book_ids - filled, set(), side)
+
+    def test_balances_follow_trades(self):
+        exchange = self.bot.exchange
+        expected = {currency: Decimal(value)
+                    for currency, value in BALANCE.items()}
+        for trade in exchange.trades:
+            cost = trade['price'] * trade['amount']
+            if trade['side'] == 'buy':
+                expected['BTC'] -= cost
+                expected['ETH'] += trade['amount'] * (1 - FEES)
+            else:
+                expected['ETH'] -= trade['amount']
+                expected['BTC'] += cost * (1 - FEES)
+        balance = exchange.fetch_balance()
+        for currency in expected:
+            self.assertEqual(Decimal(balance[currency]['total']),
+                expected[currency], currency)
+        # The used funds are the ones of the open orders
+        self.assertEqual(Decimal(balance['BTC']['used']),
+            sum(order['price'] * order['amount']
+                for order in exchange.book['buy']))
+        self.assertEqual(Decimal(balance['ETH']['used']),
+            sum(order['amount'] for order in exchange.book['sell']))
+
+
+if __name__ == '__main__':
+    unittest.main()
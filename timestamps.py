@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# Timestamps in milliseconds and their UTC dates
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from time import time_ns
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def now_ms():
+    """return: int, current timestamp in ms, like ccxt timestamps."""
+    return time_ns() // 1000000
+
+
+def ms_to_datetime(timestamp):
+    """timestamp: int, in ms.
+    return: datetime object, UTC."""
+    return EPOCH + timedelta(milliseconds=timestamp)
+
+
+def ms_to_iso(timestamp):
+    """Date of a timestamp like ccxt datetimes: 2019-01-01T00:00:00.000Z.
+    timestamp: int, in ms.
+    return: string."""
+    return ms_to_datetime(timestamp).strftime('%Y-%m-%dT%H:%M:%S.') \
+        + f'{timestamp % 1000:03d}Z'
+
+
+def ms_to_str(timestamp):
+    """Date of a timestamp in the format used by the LW logs and params:
+    2019-01-01 00:00:00.000000.
+    timestamp: int, in ms.
+    return: string."""
+    return ms_to_datetime(timestamp).strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+@lru_cache(maxsize=8192)
+def parse_ms(date_string):
+    """Timestamp of a UTC date written YYYY-MM-DD HH:MM:SS, with a space or
+    a T, optionally followed by a fraction of second and a Z. The format is
+    fixed so it is read by slicing instead of strptime, and the orders sent
+    in the same batch share their date so it's cached.
+    date_string: string.
+    return: int, timestamp in ms."""
+    if len(date_string) < 19 or date_string[4] != '-'\
+        or date_string[7] != '-' or date_string[10] not in ' T'\
+        or date_string[13] != ':' or date_string[16] != ':':
+        raise ValueError(f'{date_string} is not a YYYY-MM-DD HH:MM:SS date')
+    hour = int(date_string[11:13])
+    minute = int(date_string[14:16])
+    second = int(date_string[17:19])
+    if hour > 23 or minute > 59 or second > 59:
+        raise ValueError(f'{date_string} is not a valid time')
+    # date() check the day of the month
+    days = date(int(date_string[:4]), int(date_string[5:7]),
+        int(date_string[8:10])).toordinal() - EPOCH_ORDINAL
+    milliseconds = 0
+    fraction = date_string[19:]
+    if fraction.endswith('Z'):
+        fraction = fraction[:-1]
+    if fraction:
+        if fraction[0] != '.' or not fraction[1:].isdigit():
+            raise ValueError(f'{date_string} have an invalid fraction')
+        milliseconds = int(fraction[1:4].ljust(3, '0'))
+    return (((days * 24 + hour) * 60 + minute) * 60 + second) * 1000\
+        + milliseconds
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+# Local copy of the user trade history, fed by the fill detector
+from order import Order
+from timestamps import ms_to_str
+
+
+class TradeHistory:
+    """User trades of both sides of a market, kept in the state store.
+    The fills found by the FillDetector of each cycle are recorded, the
+    history is then read locally without asking the marketplace again."""
+
+    def __init__(self, store, market):
+        """store: StateStore object.
+        market: string, market name."""
+        self.store = store
+        self.market = market
+
+    def record(self, fills):
+        """Save the fills found by a FillDetector.
+        fills: list, of Fill.
+        return: int, number of new trades."""
+        return self.store.save_trades(self.market,
+            [Order(None, fill.price, fill.amount, fill.timestamp,
+                   ms_to_str(fill.timestamp), fill.side) for fill in fills],
+            [fill.occurrence for fill in fills])
+
+    def trades(self, since=0):
+        """return: dict, containing list of buys & sells ordered by
+            timestamp."""
+        return self.store.load_trades(self.market, since)
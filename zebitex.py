@@ -2,10 +2,14 @@
 # -*- coding: utf-8 -*-
 
 import time
+import re
+import threading
 import requests
 import json
 import hmac
 import hashlib
+from requests.adapters import HTTPAdapter
+from timestamps import now_ms
 
 class ZebitexError(Exception):
     """
@@ -16,17 +20,66 @@ class ZebitexError(Exception):
         pass
 
 class Zebitex():
-    """Zebitex's API wrapper"""
-    
-    def __init__(self, access_key=None, secret_key=None, is_staging=False):
+    """Zebitex's API wrapper.
+    All the requests go through one pooled keep-alive session, so an order
+    burst reuses the already opened TLS connections instead of doing a new
+    handshake for each call. The session is safe to share between threads.
+    When a MetricsRegistry is given, the latency of each request is observed
+    per endpoint in zebitex_request_seconds.
+    """
+
+    # Timeouts in seconds (connect, read), per endpoint. Endpoints are the
+    # API path with numeric segments replaced by {id}.
+    default_timeout = (3.05, 10)
+    endpoint_timeouts = {
+        "/api/v1/orders": (3.05, 15),
+        "/api/v1/orders/{id}/cancel": (3.05, 15),
+        "/api/v1/history/trades": (3.05, 30),
+    }
+
+    def __init__(self, access_key=None, secret_key=None, is_staging=False,
+        pool_size=10, timeouts=None, metrics=None):
         self.access_key = str(access_key) if access_key else None
         self.secret_key = str(secret_key) if secret_key else None
         self.url = "https://staging.zebitex.com" if is_staging else "https://zebitex.com"
+        self.timeouts = {**self.endpoint_timeouts, **(timeouts or {})}
+        self.pool_size = pool_size
+        self.metrics = metrics
+        self._stats_lock = threading.Lock()
+        self._requests_count = {}
+        # Requests are signed by several threads, each one need its own tonce
+        self._tonce_lock = threading.Lock()
+        self._last_tonce = 0
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+            pool_block=True)
+        self.session = requests.Session()
+        self.session.mount("https://", self.adapter)
+        self.session.headers.update(
+            {"User-Agent": "zebitex-python3 0.0.1 alpha version"})
 
     #
     # Private methods
     #
 
+    def _endpoint(self, path):
+        """Name of an endpoint: the path without the ids in it."""
+        return re.sub(r"/\d+(?=/|$)", "/{id}", path)
+
+    def _timeout(self, endpoint):
+        return self.timeouts.get(endpoint, self.default_timeout)
+
+    def _count_request(self, endpoint):
+        with self._stats_lock:
+            self._requests_count[endpoint] = \
+                self._requests_count.get(endpoint, 0) + 1
+
+    def _next_tonce(self):
+        """Tonce of a request: the timestamp in ms, or one more than the last
+        given when several requests are signed in the same ms."""
+        with self._tonce_lock:
+            self._last_tonce = max(now_ms(), self._last_tonce + 1)
+            return self._last_tonce
+
     def _signature_payload(self, method, path, tonce, params=None):
         """ Sign a payload with HMAC SHA256 and the secret key.
         The signature_payload consist of uppercased HTTP verb,
@@ -46,7 +99,7 @@ class Zebitex():
             - tonce - 13 digits timestamp
             - signed_params - a semicolon separated list of the param names submitted and signed in the request
         """
-        tonce = int(time.time() * 1000)
+        tonce = self._next_tonce()
         signature = self._signature_payload(method, path, tonce, params)
         signed_params = ";".join(params.keys()) if params else ""
         authorization_header_format = "ZEBITEX-HMAC-SHA256 access_key={}, signature={}, tonce={}, signed_params={}"
@@ -54,28 +107,62 @@ class Zebitex():
         return {"Authorization" : authorization_header}
 
     def __call__(self, level, method, path, params=None):
-        """
-
+        """Send a request through the pooled session.
+        level: string, PUBLIC or PRIVATE.
+        method: string, HTTP verb.
+        path: string, API path.
+        params: dict, optional, query parameters.
+        return: dict, json response or True when there is no content.
         """
         status_code_list = [200, 201, 204]
-        user_agent = {"User-Agent": "zebitex-python3 0.0.1 alpha version"}
-        authorization_header = {}
+        headers = {}
         params = {k: str(v) for k,v in params.items()} if params else None
         if level == "PRIVATE":
-            authorization_header = self._authorization_header(method, path, params)
+            headers = self._authorization_header(method, path, params)
         url = self.url + path
-        headers = {**user_agent, **authorization_header}
-        r = requests.request(method, url, params=params, headers=headers, json=True)
+        endpoint = self._endpoint(path)
+        self._count_request(endpoint)
+        start = time.perf_counter()
+        try:
+            r = self.session.request(method, url, params=params,
+                headers=headers, json=True, timeout=self._timeout(endpoint))
+        finally:
+            if self.metrics:
+                self.metrics.observe('zebitex_request_seconds',
+                    time.perf_counter() - start, endpoint=endpoint,
+                    method=method)
         status = {'status_code': r.status_code}
         if r.status_code >= 500:
             raise ZebitexError(status)
         if r.status_code not in status_code_list:
             raise ZebitexError({**status, **r.json()['error']})
-        if r.status_code is 200 or r.status_code is 201:
+        if r.status_code in (200, 201):
             return r.json()
         else:
             return True
 
+    def connection_stats(self):
+        """Connection reuse statistics of the session.
+        return: dict, requests sent per endpoint, total requests sent and
+            number of connections opened by the pool."""
+        with self._stats_lock:
+            requests_count = dict(self._requests_count)
+        connections = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                connections += pool.num_connections
+        total = sum(requests_count.values())
+        return {'requests': requests_count,
+                'total_requests': total,
+                'new_connections': connections,
+                'reused_connections': max(total - connections, 0)}
+
+    def close(self):
+        """Close all the pooled connections."""
+        self.session.close()
+
     #
     # Public methods
     #
@@ -1,16 +1,38 @@
-from zebitex import Zebitex, ZebitexError
+from zebitex import Zebitex
+from fixedPoint import FixedPoint
+from order import Order
 from decimal import *
-from datetime import datetime, date
-import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
+from timestamps import now_ms, ms_to_datetime, ms_to_iso, parse_ms
 
 class ZebitexFormatted():
-    """"Zebittex api formatter to get almost same output as ccxt"""
-    getcontext().prec = 8
+    """"Zebittex api formatter to get almost same output as ccxt.
+    In lean mode, open orders and trades are Order records, my trades,
+    tickers and markets are dicts with only the fields read by LW. full=True
+    give back the ccxt shape for one call."""
 
-    def __init__(self, access_key=None, secret_key=None, is_staging=False):
-        self.ze = Zebitex(access_key, secret_key, is_staging)
+    def __init__(self, access_key=None, secret_key=None, is_staging=False,
+        metrics=None, lean=False):
+        self.ze = Zebitex(access_key, secret_key, is_staging, metrics=metrics)
+        self.lean = lean
+        self.markets = {}
         self.fees = Decimal('0.0015')
+        # Every zebitex market have 8 decimals
+        self.fixed_point = FixedPoint(8)
         self.symbols = None
+        # Milliseconds between two requests, same meaning as in ccxt
+        self.rateLimit = 100
+        # Open orders and trades are read by pages of open_orders_per_page and
+        # history_per_page, the pages after the first one are asked by
+        # page_workers threads
+        self.open_orders_per_page = 200
+        self.page_workers = 4
+        self.history_per_page = 1000
+        # Called before asking each page after the first one, the first one
+        # being throttled by the caller, LazyStarter give its token bucket
+        self.throttle = None
     
     def fetch_balance(self):
         balance = self.ze.funds()
@@ -28,16 +50,78 @@ class ZebitexFormatted():
                                    Decimal(value ['lockedBalance']))}})
         return fetched_balance
 
-    def fetch_open_orders(self, market=None):
-        open_orders = self.ze.open_orders('1', '1000')
-        fetched_open_order = []
-        for item in open_orders['items']:            
-            if market:
-                if item['pair'] == market:
-                    fetched_open_order.append(self.order_formatted(item))
-            else:
-                fetched_open_order.append(self.order_formatted(item))
-        return fetched_open_order
+    def fetch_open_orders(self, market=None, full=False):
+        return list(self.iter_open_orders(market, full))
+
+    def iter_open_orders(self, market=None, full=False):
+        """Read every page of the open orders, orders of other markets are
+        skipped before being formatted. An order filled or created while the
+        pages are read shift the next pages, the orders seen twice are only
+        yielded once.
+        market: string, optional, market name.
+        full: bool, optional, ccxt shape even in lean mode.
+        return: generator, of formatted orders."""
+        if self.lean and not full:
+            formatter = self.order_record
+        else:
+            formatter = self.order_formatted
+        seen = set()
+        for response in self.iter_pages(self.ze.open_orders,
+            self.open_orders_per_page):
+            for item in response['items']:
+                if item['id'] in seen:
+                    continue
+                seen.add(item['id'])
+                if not market or item['pair'] == market:
+                    yield formatter(item)
+
+    def iter_pages(self, fetch_page, per):
+        """Read every page of a paginated API call. The first page give the
+        number of pages, the other ones are asked concurrently and yielded
+        in page order as soon as they arrive.
+        fetch_page: function, called with a page number and per.
+        per: int, number of items per page.
+        return: generator, of API answers."""
+        response = fetch_page(1, per)
+        yield response
+        nb_pages = self.nb_pages(response, per)
+        page = 1
+        if nb_pages is not None and nb_pages > 1:
+            with ThreadPoolExecutor(
+                max_workers=min(self.page_workers, nb_pages - 1)) as pool:
+                for response in pool.map(lambda page: self.fetch_next_page(
+                    fetch_page, page, per), range(2, nb_pages + 1)):
+                    yield response
+            page = nb_pages
+        # Without metadata, or when items have been added since the first
+        # page, pages are read until a page isn't full
+        while len(response['items']) >= per:
+            page += 1
+            response = self.fetch_next_page(fetch_page, page, per)
+            yield response
+
+    def fetch_next_page(self, fetch_page, page, per):
+        """Ask a page after the first one, through throttle when set."""
+        if self.throttle:
+            self.throttle()
+        return fetch_page(page, per)
+
+    def nb_pages(self, response, per):
+        """Number of pages of a paginated answer, from its metadata.
+        return: int, or None when the answer doesn't give it."""
+        for key in ('totalPages', 'total_pages', 'pages'):
+            if response.get(key) is not None:
+                return int(response[key])
+        if response.get('total') is not None:
+            return -(-int(response['total']) // int(response.get('per', per)))
+        return None
+
+    def order_record(self, order):
+        """Lean version of order_formatted().
+        return: Order object."""
+        return Order(order['id'], order['price'], order['amount'],
+            parse_ms(order['updatedAt']), order['updatedAt'],
+            order['side'])
 
     def order_formatted(self, order):
         return {'info': 
@@ -54,7 +138,7 @@ class ZebitexFormatted():
                      'side': order['side'],
                      'price': order['price']},
                 'id': order['id'],
-                'timestamp': self.str_to_epoch(order['updatedAt']), #carefull, it will construct epoch following your personnal timezone
+                'timestamp': parse_ms(order['updatedAt']),
                 'datetime': order['updatedAt'],
                 'lastTradeTimestamp': None, #Not enough info fro the api to construct it
                 'status': order['state'],
@@ -72,11 +156,37 @@ class ZebitexFormatted():
                 'fee': float(self.calcultate_paid_fees(order['filled']))
                 }
 
-    def load_markets(self):
+    def load_markets(self, full=False):
         tickers = self.ze.tickers()
-        fetched_tickers = {}
+        self.symbols = self.format_symbols_list(tickers)
+        if self.lean and not full:
+            self.markets = {ticker['name']: {'symbol': ticker['name'],
+                'precision': {'amount': 8, 'price': 8}}
+                for ticker in tickers.values()}
+            return self.markets
+        self.markets = {market['symbol']: market
+                        for market in self.markets_formatted(tickers)}
+        return self.markets
+
+    def fetch_markets(self):
+        """Read the markets without loading them, ccxt like.
+        return: list, of formatted markets."""
+        return self.markets_formatted(self.ze.tickers())
+
+    def fetch_market_metadata(self):
+        """Read the symbols and the markets without loading them, the
+        symbols built like load_markets() does.
+        return: dict, with the symbols list and the markets dict."""
+        tickers = self.ze.tickers()
+        return {'symbols': self.format_symbols_list(tickers),
+                'markets': {market['symbol']: market
+                            for market in self.markets_formatted(tickers)}}
+
+    def markets_formatted(self, tickers):
+        """return: list, of the markets of the tickers formatted by ccxt."""
+        markets = []
         for key, ticker in tickers.items():
-            fetched_tickers.update({ticker['name']: {
+            markets.append({
                 'fee_loaded': False,
                 'percentage': True,
                 'maker': ticker['ask_fee'],
@@ -100,9 +210,8 @@ class ZebitexFormatted():
                          'isFrozen': '0',
                          'high24hr': ticker['high'],
                          'low24hr': ticker['low']
-                         }}})
-        self.symbols = self.format_symbols_list(tickers)
-        return
+                         }})
+        return markets
 
     def format_symbols_list(self, tickers):
         symbols = []
@@ -114,13 +223,17 @@ class ZebitexFormatted():
             symbols.append(item.upper())
         return symbols
 
-    def fetch_ticker(self, ticker_name):
+    def fetch_ticker(self, ticker_name, full=False):
         formatted_ticker_name = ticker_name.split('/')
         formatted_ticker_name = (formatted_ticker_name[0] + formatted_ticker_name[1]).lower()
         ticker = self.ze.ticker(formatted_ticker_name)
+        if self.lean and not full:
+            return {'symbol': ticker_name,
+                    'timestamp': ticker['at'] * 1000,
+                    'last': float(ticker['last'])}
         return {'symbol': ticker_name, 
-                'timestamp': ticker['at'], 
-                'datetime': self.epoch_to_str(ticker['at']), 
+                'timestamp': ticker['at'] * 1000,
+                'datetime': ms_to_iso(ticker['at'] * 1000),
                 'high': float(ticker['high']), 
                 'low': float(ticker['low']), 
                 'bid': float(ticker['sell']), 
@@ -148,16 +261,87 @@ class ZebitexFormatted():
                          'high24hr': None, 
                          'low24hr': None}}
 
-    def fetch_trades(self, market):
-        history = self.ze.trade_history('buy', '2018-04-01',
-            date.today().isoformat(), 1, 1000)
-        my_trades = []
-        for item in history['items']:
-            market_name = item['baseCurrency'] + '/' + item['quoteCurrency']
-            if market:
-                if market_name == market:
-                    my_trades.append(self.trade_formatted(item, market_name))
-        return my_trades
+    def fetch_trades(self, market, since=None, full=False):
+        """Get the user trades of both sides as Order records in lean mode.
+        market: string, market name.
+        since: int, optional, timestamp in ms of the oldest trade wanted.
+        full: bool, optional, ccxt shape even in lean mode.
+        return: list, of formatted trades ordered by timestamp."""
+        if self.lean and not full:
+            formatter = self.trade_record
+        else:
+            formatter = self.trade_formatted
+        return self.trades_since(market, since, formatter)
+
+    def fetch_my_trades(self, symbol=None, since=None, limit=None,
+        full=False):
+        """Get the user trades of both sides, ccxt like.
+        symbol: string, optional, market name.
+        since: int, optional, timestamp in ms of the oldest trade wanted.
+        limit: int, optional, number of trades per page. The pages are then
+            read newest first until a trade older than since, only the
+            first one without since.
+        full: bool, optional, ccxt shape even in lean mode.
+        return: list, of formatted trades ordered by timestamp."""
+        if self.lean and not full:
+            formatter = self.trade_lean
+        else:
+            formatter = self.trade_formatted
+        return self.trades_since(symbol, since, formatter, limit)
+
+    def trades_since(self, market, since, formatter, limit=None):
+        """Read the pages of the trade history of both sides.
+        formatter: function, called with a trade and its market name.
+        return: list, of formatted trades ordered by timestamp."""
+        if since:
+            # The API filter by day, one day of margin for the timezones
+            start_date = (ms_to_datetime(since).date() -
+                timedelta(days=1)).isoformat()
+        else:
+            start_date = '2018-04-01'
+        end_date = (ms_to_datetime(now_ms()).date() +
+            timedelta(days=1)).isoformat()
+        trades = []
+        for side in ('buy', 'sell'):
+            fetch_page = partial(self.ze.trade_history, side, start_date,
+                end_date)
+            if limit:
+                pages = self.iter_recent_pages(fetch_page, limit, since)
+            else:
+                pages = self.iter_pages(fetch_page, self.history_per_page)
+            for history in pages:
+                for item in history['items']:
+                    market_name = item['baseCurrency'] + '/' +\
+                        item['quoteCurrency']
+                    if market and market_name != market:
+                        continue
+                    if since and parse_ms(item['createdAt']) < since:
+                        continue
+                    trades.append(formatter(item, market_name))
+        return sorted(trades, key=self.trade_timestamp)
+
+    def iter_recent_pages(self, fetch_page, per, since=None):
+        """Read the pages of the trade history, newest trades first, until
+        one reaches since. A few new trades then cost one small page instead
+        of the whole history since the start date.
+        fetch_page: function, called with a page number and per.
+        per: int, number of items per page.
+        since: int, optional, timestamp in ms, only the first page is read
+            without it.
+        return: generator, of API answers."""
+        page = 1
+        response = fetch_page(page, per)
+        yield response
+        while since and len(response['items']) >= per\
+            and parse_ms(response['items'][-1]['createdAt']) >= since:
+            page += 1
+            response = self.fetch_next_page(fetch_page, page, per)
+            yield response
+
+    def trade_timestamp(self, trade):
+        if isinstance(trade, Order):
+            return trade.timestamp
+        return trade['timestamp']
 
     def trade_formatted(self, trade, market_name):
         return {'info': {'globalTradeID': None,
@@ -170,8 +354,8 @@ class ZebitexFormatted():
                          'orderNumber': None,
                          'type': trade['side'],
                          'category': 'exchange'},
-                'timestamp': self.str_to_epoch(trade['createdAt']),
-                'datetime': trade['createdAt'] + '.000Z',
+                'timestamp': parse_ms(trade['createdAt']),
+                'datetime': ms_to_iso(parse_ms(trade['createdAt'])),
                 'symbol': market_name,
                 'id': None,
                 'order': None,
@@ -186,6 +370,24 @@ class ZebitexFormatted():
                             trade['quoteAmount'])),
                         'currency': trade['quoteCurrency']}}
 
+    def trade_record(self, trade, market_name=None):
+        """Lean version of trade_formatted() for fetch_trades().
+        return: Order object."""
+        return Order(None, trade['price'], trade['baseAmount'],
+            parse_ms(trade['createdAt']),
+            ms_to_iso(parse_ms(trade['createdAt'])), trade['side'])
+
+    def trade_lean(self, trade, market_name=None):
+        """Lean version of trade_formatted() for fetch_my_trades(), with the
+        fields read by FillDetector.
+        return: dict."""
+        return {'id': None,
+                'order': None,
+                'side': trade['side'],
+                'price': trade['price'],
+                'amount': trade['baseAmount'],
+                'timestamp': parse_ms(trade['createdAt'])}
+
     def create_limit_buy_order(self, symbol, amount, price):
         symbol = symbol.lower().split('/')
         return self.ze.new_order(symbol[0], symbol[1], 'bid', price, amount,
@@ -199,17 +401,9 @@ class ZebitexFormatted():
     def cancel_order(self, order_id):
         return self.ze.cancel_order(int(order_id))
 
-    def str_to_epoch(self, date_string):
-        return int(str(time.mktime(datetime.strptime(date_string,
-            '%Y-%m-%d %H:%M:%S').timetuple())).split('.')[0] + '000')
-
-    def epoch_to_str(self, epoch):
-        return datetime.fromtimestamp(epoch).isoformat() + '.000Z'
-
     def calculate_filled_cost(self, amt_filled, price):
-        return (Decimal(amt_filled) * Decimal(price) * (Decimal('1') -\
-            self.fees).quantize(Decimal('.00000001'), rounding=ROUND_HALF_EVEN))
+        return self.fixed_point.multiplier(amt_filled, price,
+            Decimal('1') - self.fees)
     
     def calcultate_paid_fees(self, amt_filled):
-        return (Decimal(amt_filled) * self.fees).quantize(Decimal('.00000001'),
-                                                      rounding=ROUND_HALF_EVEN)
\ No newline at end of file
+        return self.fixed_point.multiplier(amt_filled, self.fees)
\ No newline at end of file